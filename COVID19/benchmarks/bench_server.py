@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from multiprocessing import get_context
+from urllib.parse import quote
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'visualizations'))
+
+from covid_server import QueryServer, QueryService
+
+def serve(path, cache_size, queue):
+    """
+    Run the server in a child process, sends its port to `queue`.
+    """
+
+    async def main():
+        server = QueryServer(service=QueryService(path=path, cache_size=cache_size), port=0)
+        await server.start()
+        queue.put(server.port)
+        await server.server.serve_forever()
+
+    asyncio.run(main())
+
+def get_targets(path, n_requests, seed=0):
+    """
+    Mix of requests to all endpoints.
+    """
+
+    service = QueryService(path=path)
+    countries = [quote(c) for c in service.viz.all_countries]
+    continents = [quote(c) for c in service.viz.all_continents]
+
+    rng = random.Random(seed)
+
+    choices = [lambda: f'/countries/{rng.choice(countries)}',
+               lambda: f'/countries/{rng.choice(countries)}?format=csv',
+               lambda: f'/continents/{rng.choice(continents)}',
+               lambda: '/world',
+               lambda: f'/most_cases?case_type={rng.choice(["Confirmed", "Dead", "Recovered"])}&n=10',
+               lambda: f'/highest_mortality?n={rng.choice([5, 10, 20])}']
+
+    return [rng.choice(choices)() for _ in range(n_requests)]
+
+async def fetch(reader, writer, target):
+
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+
+    await reader.readexactly(length)
+
+    return status
+
+async def run_client(port, targets, connections):
+    """
+    Send `targets` over keep-alive connections,
+    returns latency of each request in seconds.
+    """
+
+    queue = asyncio.Queue()
+    for target in targets:
+        queue.put_nowait(target)
+
+    latencies = list()
+    errors = list()
+
+    async def worker():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+        while not queue.empty():
+            target = queue.get_nowait()
+
+            start = time.perf_counter()
+            status = await fetch(reader, writer, target)
+            latencies.append(time.perf_counter() - start)
+
+            if status != 200:
+                errors.append((target, status))
+
+        writer.close()
+
+    await asyncio.gather(*[worker() for _ in range(connections)])
+
+    return latencies, errors
+
+def run(path, n_requests=5000, connections=16, cache_size=1024):
+    """
+    Start a server and measure throughput and latency.
+    """
+
+    context = get_context('spawn')
+    queue = context.Queue()
+
+    server = context.Process(target=serve, args=(path, cache_size, queue), daemon=True)
+    server.start()
+
+    try:
+        port = queue.get(timeout=60)
+        targets = get_targets(path=path, n_requests=n_requests)
+
+        start = time.perf_counter()
+        latencies, errors = asyncio.run(run_client(port=port, targets=targets, connections=connections))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.join()
+
+    latencies = np.array(latencies) * 1000
+
+    return {'requests': n_requests,
+            'connections': connections,
+            'cache_size': cache_size,
+            'errors': len(errors),
+            'requests_per_sec': n_requests / elapsed,
+            'p50_ms': np.percentile(latencies, 50),
+            'p99_ms': np.percentile(latencies, 99),
+            'max_ms': latencies.max()}
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Measure requests/sec and latency of the query server.')
+    parser.add_argument('--path', default='../data/processed')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--output', help='File to write results to.')
+    args = parser.parse_args()
+
+    results = list()
+    for cache_size in [1024, 0]:
+        result = run(path=args.path, n_requests=args.requests, connections=args.connections, cache_size=cache_size)
+        results.append(result)
+
+        print(f'cache size {cache_size:>5}: {result["requests_per_sec"]:8.1f} requests/s, '
+              f'p50 {result["p50_ms"]:.2f} ms, p99 {result["p99_ms"]:.2f} ms, {result["errors"]} errors')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,183 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+COVID_PATH = 'data/raw/COVID-19/csse_covid_19_data/csse_covid_19_time_series'
+DATAHUB_PATH = 'data/raw/datahub'
+WORLD_BANK_PATH = 'data/raw/world_bank'
+OUT_PATH = 'data/processed'
+
+CONTINENTS = [('Africa', 'AF'), ('Asia', 'AS'), ('Europe', 'EU'), ('North America', 'NA'),
+              ('Oceania', 'OC'), ('South America', 'SA')]
+
+INDICATORS = ['SP.DYN.LE00.IN', 'NY.GDP.PCAP.PP.CD', 'SP.URB.TOTL.IN.ZS', 'SP.RUR.TOTL.ZS',
+              'EN.POP.SLUM.UR.ZS', 'SP.POP.TOTL', 'SH.XPD.CHEX.GD.ZS']
+
+# Share of confirmed cases that recovered / died
+RECOVERED_RATE = 0.5
+DEAD_RATE = 0.05
+
+def get_date_columns(n_days, start='2020-01-22'):
+    """
+    Date column names in JHU format, eg 1/22/20.
+    """
+
+    dates = pd.date_range(start, periods=n_days)
+
+    return [f'{d.month}/{d.day}/{d.year % 100}' for d in dates]
+
+def get_regions(n_regions, n_countries):
+    """
+    Spread regions over countries, regions beyond
+    one per country become provinces.
+    """
+
+    countries = [f'Country {i:04d}' for i in range(n_countries)]
+
+    country = np.arange(n_regions) % n_countries
+    province = np.where(np.arange(n_regions) < n_countries, None,
+                        [f'Province {i:05d}' for i in range(n_regions)])
+
+    regions = pd.DataFrame({'Province/State': province,
+                            'Country/Region': np.array(countries, dtype=object)[country]})
+
+    return regions, countries
+
+def get_cases(n_regions, n_days, rng):
+    """
+    Cumulative cases starting at random dates.
+    """
+
+    new = rng.poisson(rng.gamma(1., 50., size=(n_regions, 1)), size=(n_regions, n_days))
+
+    start = rng.integers(0, max(n_days // 2, 1), size=(n_regions, 1))
+    new[np.arange(n_days) < start] = 0
+
+    return np.cumsum(new, axis=1)
+
+def write_global(path, regions, cases, dates, rng):
+
+    coords = pd.DataFrame({'Lat': rng.uniform(-60, 70, len(regions)),
+                           'Long': rng.uniform(-180, 180, len(regions))})
+
+    for kind, rate in [('confirmed', 1.), ('recovered', RECOVERED_RATE), ('deaths', DEAD_RATE)]:
+        values = pd.DataFrame((cases * rate).astype(np.int64), columns=dates)
+        df = pd.concat([regions, coords, values], axis=1)
+        df.to_csv(f'{path}/time_series_covid19_{kind}_global.csv', index=False)
+
+def write_us(path, n_counties, cases, dates, rng):
+
+    n_states = max(n_counties // 60, 1)
+    uid = 84000000 + np.arange(n_counties)
+
+    counties = pd.DataFrame({'UID': uid,
+                             'iso2': 'US',
+                             'iso3': 'USA',
+                             'code3': 840,
+                             'FIPS': (uid % 100000).astype(np.float64),
+                             'Admin2': [f'County {i:05d}' for i in range(n_counties)],
+                             'Province_State': [f'State {i % n_states:03d}' for i in range(n_counties)],
+                             'Country_Region': 'US',
+                             'Lat': rng.uniform(25, 50, n_counties),
+                             'Long_': rng.uniform(-125, -65, n_counties)})
+    counties['Combined_Key'] = counties['Admin2'] + ', ' + counties['Province_State'] + ', US'
+
+    for kind, rate in [('confirmed', 1.), ('deaths', DEAD_RATE)]:
+        df = counties.copy()
+        if kind == 'deaths':
+            df['Population'] = rng.integers(1000, 1000000, n_counties)
+        values = pd.DataFrame((cases[:n_counties] * rate).astype(np.int64), columns=dates)
+        df = pd.concat([df, values], axis=1)
+        df.to_csv(f'{path}/time_series_covid19_{kind}_US.csv', index=False)
+
+def write_countries(path, countries):
+    """
+    Write countries.csv in datahub format.
+    """
+
+    n = len(countries)
+    continents = [CONTINENTS[i % len(CONTINENTS)] for i in range(n)]
+
+    df = pd.DataFrame({'Continent_Name': [c[0] for c in continents],
+                       'Continent_Code': [c[1] for c in continents],
+                       'Country_Name': countries,
+                       'Two_Letter_Country_Code': [f'{i:02d}' for i in range(n)],
+                       'Three_Letter_Country_Code': [f'C{i:03d}' for i in range(n)],
+                       'Country_Number': np.arange(n)})
+
+    df.to_csv(f'{path}/countries.csv', index=False)
+
+def write_world_bank(path, out_path, countries, rng, years=range(2010, 2020)):
+
+    codes = pd.DataFrame({'Country Name': countries,
+                          'Country Code': [f'C{i:03d}' for i in range(len(countries))]})
+    codes.to_csv(f'{out_path}/world_bank_codes.csv', index=False)
+
+    index = pd.MultiIndex.from_product([countries, years], names=['country', 'date']).to_frame(index=False)
+
+    for indicator in INDICATORS:
+        df = index.copy()
+        df[indicator] = rng.uniform(1, 100, len(df))
+        df.loc[rng.uniform(size=len(df)) < 0.2, indicator] = np.nan
+        df.to_csv(f'{path}/{indicator}.csv', index=False)
+
+def get_n_countries(n_regions, n_countries=None):
+    """
+    Distinct countries of `n_regions` regions,
+    at most 190 unless given.
+    """
+
+    return min(n_countries or 190, n_regions)
+
+def generate(root, n_regions=190, n_days=100, n_countries=None, seed=0):
+    """
+
+    Write JHU-shaped raw data into `root`, laid out
+    like ./data in the COVID19 project.
+
+    Inputs
+    ------
+    n_regions : int
+        Rows of the global time series, also the
+        number of counties of the US time series.
+    n_days : int
+        Date columns of the time series.
+    n_countries : int
+        Distinct countries, at most 190 by default
+        and at most `n_regions`. Further regions
+        become provinces.
+
+    """
+
+    rng = np.random.default_rng(seed)
+    n_countries = get_n_countries(n_regions=n_regions, n_countries=n_countries)
+
+    paths = [f'{root}/{path}' for path in [COVID_PATH, DATAHUB_PATH, WORLD_BANK_PATH, OUT_PATH]]
+    for path in paths:
+        os.makedirs(path, exist_ok=True)
+
+    covid_path, datahub_path, world_bank_path, out_path = paths
+
+    regions, countries = get_regions(n_regions=n_regions, n_countries=n_countries)
+    cases = get_cases(n_regions=n_regions, n_days=n_days, rng=rng)
+    dates = get_date_columns(n_days)
+
+    write_global(covid_path, regions=regions, cases=cases, dates=dates, rng=rng)
+    write_us(covid_path, n_counties=n_regions, cases=cases, dates=dates, rng=rng)
+    write_countries(datahub_path, countries=countries)
+    write_world_bank(world_bank_path, out_path, countries=countries, rng=rng)
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Generate synthetic raw data.')
+    parser.add_argument('path', help='Directory to write data/raw and data/processed to.')
+    parser.add_argument('--regions', type=int, default=190)
+    parser.add_argument('--days', type=int, default=100)
+    parser.add_argument('--countries', type=int,
+                        help='Distinct countries, at most 190 by default.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate(root=args.path, n_regions=args.regions, n_days=args.days, n_countries=args.countries, seed=args.seed)
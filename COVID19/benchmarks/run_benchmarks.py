@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+
+from generate_data import generate, get_n_countries
+from instrument import get_peak_rss
+from make_all import get_stages
+from pipeline import MANIFEST_NAME, Pipeline
+from storage import BACKENDS, DEFAULT_BACKEND
+
+# (regions, days, countries), the last one wide with
+# as many countries as regions and no provinces
+DEFAULT_SIZES = [(190, 100, 190), (1000, 500, 190), (5000, 2000, 190), (5000, 500, 5000)]
+
+# Allowed slowdown before a stage counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+# Stages faster than this are too noisy to compare
+MIN_TIME = 0.05
+
+def measure(stage, root):
+    """
+    Run a stage with `root` as working directory.
+    """
+
+    os.chdir(root)
+
+    start, start_cpu = time.perf_counter(), time.process_time()
+    stage.run()
+
+    return {'wall_time': time.perf_counter() - start,
+            'cpu_time': time.process_time() - start_cpu,
+            'peak_rss_mb': get_peak_rss()}
+
+def run_size(n_regions, n_days, n_countries=None, backend=DEFAULT_BACKEND, path=None):
+    """
+    Generate data of one size and time all stages on it.
+    """
+
+    n_countries = get_n_countries(n_regions=n_regions, n_countries=n_countries)
+
+    with tempfile.TemporaryDirectory(dir=path) as root:
+
+        print(f'Generating {n_regions} regions x {n_days} days x {n_countries} countries.')
+        generate(root=root, n_regions=n_regions, n_days=n_days, n_countries=n_countries)
+
+        stages = Pipeline(stages=get_stages(backend=backend),
+                          manifest_path=f'{root}/{MANIFEST_NAME}').ordered()
+
+        results = list()
+        for stage in stages:
+            # Fresh process per stage, so that peak RSS is not
+            # carried over from earlier stages
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                result = executor.submit(measure, stage, root).result()
+
+            print(f'{stage.name:>30}: {result["wall_time"]:8.3f} s {result["peak_rss_mb"]:8.1f} MB')
+
+            results.append(dict(regions=n_regions, days=n_days, countries=n_countries, stage=stage.name, **result))
+
+    return results
+
+def get_environment(backend):
+
+    return {'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+            'backend': backend}
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, min_time=MIN_TIME):
+    """
+    Find stages slower or using more memory than in `baseline`
+    by more than `tolerance`.
+
+    Returns list of (regions, days, countries, stage, measure, baseline, result).
+    """
+
+    key = lambda r: (r['regions'], r['days'], r.get('countries'), r['stage'])
+    previous = {key(r): r for r in baseline}
+
+    regressions = list()
+    for result in results:
+        base = previous.get(key(result))
+
+        if base is None:
+            continue
+
+        if max(result['wall_time'], base['wall_time']) >= min_time \
+                and result['wall_time'] > base['wall_time'] * (1 + tolerance):
+            regressions.append(key(result) + ('wall_time', base['wall_time'], result['wall_time']))
+
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(key(result) + ('peak_rss_mb', base['peak_rss_mb'], result['peak_rss_mb']))
+
+    return regressions
+
+def parse_size(size):
+    """
+    Parse REGIONSxDAYS or REGIONSxDAYSxCOUNTRIES.
+    """
+
+    parts = [int(part) for part in size.lower().split('x')]
+
+    if len(parts) not in (2, 3):
+        raise argparse.ArgumentTypeError(f'invalid size: {size!r}')
+
+    n_regions, n_days = parts[:2]
+
+    return n_regions, n_days, get_n_countries(n_regions=n_regions, n_countries=parts[2] if len(parts) == 3 else None)
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Time pipeline stages on synthetic data.')
+    parser.add_argument('--size', type=parse_size, action='append', metavar='REGIONSxDAYS[xCOUNTRIES]',
+                        help='Data size, eg 190x100 or 5000x500x5000. Can be repeated.')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='File to write results to.')
+    parser.add_argument('--baseline',
+                        help='Results of an earlier run to compare against.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative slowdown or memory increase.')
+    parser.add_argument('--tmp', help='Directory for generated data.')
+    args = parser.parse_args()
+
+    results = list()
+    for n_regions, n_days, n_countries in args.size or DEFAULT_SIZES:
+        results += run_size(n_regions=n_regions, n_days=n_days, n_countries=n_countries,
+                            backend=args.backend, path=args.tmp)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': get_environment(args.backend), 'results': results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+        regressions = compare(results, baseline, tolerance=args.tolerance)
+
+        for n_regions, n_days, n_countries, stage, name, before, after in regressions:
+            print(f'Regression in {stage} ({n_regions}x{n_days}x{n_countries}), {name}: {before:.3f} -> {after:.3f}')
+
+        if regressions:
+            sys.exit(1)
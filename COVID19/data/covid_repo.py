@@ -0,0 +1,53 @@
+import os
+
+from git import Repo
+
+TIME_SERIES_PATH = 'csse_covid_19_data/csse_covid_19_time_series'
+
+DEFAULT_BRANCH = 'master'
+
+def clone_repo(url, path, sparse_path=TIME_SERIES_PATH, branch=DEFAULT_BRANCH, depth=1):
+    """
+    Shallow clone checking out only `sparse_path`.
+    """
+
+    repo = Repo.init(path)
+    repo.create_remote('origin', url)
+    repo.git.sparse_checkout('set', sparse_path)
+
+    repo.git.fetch('origin', branch, depth=depth)
+    repo.git.checkout('-B', branch, 'FETCH_HEAD')
+
+    return repo
+
+def list_files(repo, sparse_path=TIME_SERIES_PATH):
+
+    return repo.git.ls_files('--', sparse_path).splitlines()
+
+def update_repo(url, path, sparse_path=TIME_SERIES_PATH, branch=DEFAULT_BRANCH, depth=1):
+    """
+    Bring a checkout of `url` up to date, fetching only the
+    newest commit. Clones the repo if `path` is not a checkout.
+
+    Returns list of changed files in `sparse_path`, all of
+    them after a fresh clone.
+    """
+
+    if not os.path.isdir(os.path.join(path, '.git')):
+        repo = clone_repo(url=url, path=path, sparse_path=sparse_path, branch=branch, depth=depth)
+        return list_files(repo, sparse_path=sparse_path)
+
+    repo = Repo(path)
+    old = repo.head.commit.hexsha
+
+    repo.git.fetch('origin', branch, depth=depth)
+    new = repo.git.rev_parse('FETCH_HEAD')
+
+    if new == old:
+        return []
+
+    changed = repo.git.diff('--name-only', old, new, '--', sparse_path).splitlines()
+
+    repo.git.reset('--hard', new)
+
+    return changed
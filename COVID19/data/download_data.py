@@ -1,9 +1,13 @@
+import os
 from shutil import rmtree
 
-import requests
 import wbdata
-from git import Repo
-from time import sleep
+
+from covid_repo import update_repo
+from downloader import Downloader
+
+# World Bank API calls per second
+WORLD_BANK_RATE = 0.5
 
 def delete_directory(path):
     """
@@ -15,9 +19,12 @@ def delete_directory(path):
     except FileNotFoundError:
         pass    
 
-def download_covid():
+def download_covid(fresh=False):
     """
-    Download COVID-19 case data.
+    Download COVID-19 case data, only new commits are
+    fetched into an existing checkout.
+
+    Returns list of changed time series files.
     """
 
     url = 'https://github.com/CSSEGISandData/COVID-19'
@@ -25,14 +32,19 @@ def download_covid():
 
     print('Downloading covid data.')
 
-    delete_directory(path=path)
+    if fresh:
+        delete_directory(path=path)
+
+    changed = update_repo(url=url, path=path)
 
-    # Clone repo with covid data
-    Repo.clone_from(url, to_path=path)
+    print(f'{len(changed)} time series files changed.')
 
-def download_countries():
+    return changed
+
+def download_countries(downloader=None):
     """
-    Download countries csv.
+    Download countries csv, skipped if unchanged
+    since the last download.
     """
     
     url = 'https://datahub.io/JohnSnowLabs/country-and-continent-codes-list/r/country-and-continent-codes-list-csv.csv'
@@ -40,21 +52,39 @@ def download_countries():
 
     print('Downloading country data.')
 
-    delete_directory(path=path)
+    downloader = downloader or Downloader()
 
-    req = requests.get( url=url)
-    content = req.content
-    with open(f'{path}/countries.csv', 'wb') as csv:
-        csv.write(content)
+    return downloader.fetch(url=url, path=f'{path}/countries.csv')
 
-def download_world_bank():
+def download_indicator(indicator, path):
     """
-    Download data from the World Bank
+    Download one World Bank indicator.
+    """
+
+    file_name = list(indicator.keys())[0]
+    full_path = f'{path}/{file_name}.csv'
+
+    print(f'Downloading {indicator}.')
+
+    try:
+        df = wbdata.get_dataframe(indicator)
+        df.to_csv(f'{full_path}.part')
+        os.replace(f'{full_path}.part', full_path)
+    except Exception:
+        print(f'Download failed for {indicator}')
+        return False
+
+    return True
+
+def download_world_bank(downloader=None):
+    """
+    Download data from the World Bank, a few
+    indicators at a time.
     """
 
     path = './data/world_bank'
 
-    delete_directory(path=path)
+    os.makedirs(path, exist_ok=True)
 
     indicators = [{'NY.GDP.PCAP.PP.CD': f'GDP per capita, PPP (current international $)'},
                   {'SP.POP.TOTL': f'Population, total'},
@@ -64,19 +94,9 @@ def download_world_bank():
                   {'SP.DYN.LE00.IN': f'Life expectancy at birth, total (years)'},
                   {'SH.XPD.CHEX.GD.ZS': f'Current health expenditure (% of GDP)'}]
 
-    for indicator in indicators:
-
-        file_name = list(indicator.keys())[0]
-        full_path = f'{path}/{file_name}.csv'
-
-        print(f'Downloading {indicator}.')        
+    downloader = downloader or Downloader(rate=WORLD_BANK_RATE)
 
-        try:
-            df = wbdata.get_dataframe(indicator)
-            df.to_csv(full_path)
-            sleep(2)
-        except Exception:
-            print(f'Download failed for {indicator}')
+    return downloader.map(lambda indicator: download_indicator(indicator, path=path), indicators)
 
 if __name__ == '__main__':
     
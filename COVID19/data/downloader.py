@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+class RateLimiter(object):
+    """
+
+    Allow at most `rate` calls per second, shared between threads.
+
+    """
+
+    def __init__(self, rate):
+
+        self.interval = 1 / rate if rate else 0
+        self.next_call = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+class Downloader(object):
+    """
+
+    Download files over a pool of HTTP connections.
+
+    Files are streamed to `{path}.part` and moved in place when
+    complete. ETag and Last-Modified headers are kept in `{path}.meta`
+    and sent back on the next download, so unchanged files are not
+    transferred again. Interrupted downloads are resumed with a
+    range request.
+
+    Inputs
+    ------
+    max_workers : int
+        Number of files downloaded at the same time.
+    rate : float
+        Maximum number of requests per second, None for no limit.
+    timeout : float
+        Seconds to wait for the server.
+
+    """
+
+    chunk_size = 2 ** 16
+
+    def __init__(self, max_workers=4, rate=None, timeout=60, session=None):
+
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate)
+        self.timeout = timeout
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers,
+                                  pool_maxsize=max_workers,
+                                  max_retries=3)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+
+        self.session = session
+
+    @staticmethod
+    def read_meta(path):
+
+        try:
+            with open(f'{path}.meta') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return dict()
+
+    @staticmethod
+    def write_meta(path, meta):
+
+        with open(f'{path}.meta', 'w') as f:
+            json.dump(meta, f)
+
+    def get_headers(self, path, meta):
+        """
+
+        Build conditional and range request headers.
+
+        """
+
+        headers = dict()
+        part = f'{path}.part'
+
+        if meta.get('partial'):
+            # Resume only if the file did not change in the meantime
+            validator = meta.get('etag') or meta.get('last_modified')
+            if validator and os.path.exists(part):
+                headers['Range'] = f'bytes={os.path.getsize(part)}-'
+                headers['If-Range'] = validator
+
+        elif os.path.exists(path):
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        return headers
+
+    def fetch(self, url, path):
+        """
+
+        Download `url` to `path`. Returns True if the file changed,
+        False if the server reported it as not modified.
+
+        """
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        meta = self.read_meta(path)
+        headers = self.get_headers(path=path, meta=meta)
+
+        self.limiter.wait()
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+
+            if response.status_code == 304:
+                return False
+
+            response.raise_for_status()
+
+            meta = {'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'partial': True}
+            self.write_meta(path, meta)
+
+            # 206 continues the partial file, 200 starts again
+            mode = 'ab' if response.status_code == 206 else 'wb'
+            part = f'{path}.part'
+
+            with open(part, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+
+        os.replace(part, path)
+
+        meta['partial'] = False
+        self.write_meta(path, meta)
+
+        return True
+
+    def map(self, func, items):
+        """
+
+        Apply `func` to items using the worker pool, with
+        requests rate limited. Returns list of results.
+
+        """
+
+        def limited(item):
+            self.limiter.wait()
+            return func(item)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(limited, items))
+
+    def fetch_all(self, files):
+        """
+
+        Download many files at the same time.
+
+        Inputs
+        ------
+        files : list of tuples
+            Pairs of (url, path).
+
+        Returns dict of path -> True if the file changed.
+
+        """
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            changed = executor.map(lambda f: self.fetch(url=f[0], path=f[1]), files)
+
+            return {path: c for (_, path), c in zip(files, changed)}
@@ -0,0 +1,293 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+METRICS = ['Confirmed', 'Recovered', 'Dead', 'Active']
+
+# Days recomputed on incremental updates, to pick up revisions
+# of recent data. Revisions of older data are found by comparing
+# hashes of source values, see `read_previous`.
+REVISION_DAYS = 7
+
+class CasesMatrix(object):
+    """
+
+    Case time series of all countries stored as one memory mapped
+    array of shape (metric, date, country), with dates and country
+    names kept in a json sidecar file.
+
+    Accessors return views of the mapped file, so processes
+    opening the same matrix share its memory.
+
+    New matrices are written to temporary files and replace the
+    previous ones on `commit`, so readers never map a partially
+    written file.
+
+    Inputs
+    ------
+    path : str
+        Directory with processed data.
+    name : str
+        Name of the matrix, files are `{name}.npy` and `{name}.json`.
+    mode : str
+        Mode passed to `np.load`, 'r' for read only access.
+
+    """
+
+    def __init__(self, path, name='cases', mode='r'):
+
+        self.path = path
+        self.name = name
+        self._pending = None
+
+        self._open(npy_file=f'{path}/{name}.npy', json_file=f'{path}/{name}.json', mode=mode)
+
+    def _open(self, npy_file, json_file, mode, retries=3):
+
+        for attempt in range(retries):
+            with open(json_file) as f:
+                index = json.load(f)
+
+            self.values = np.load(npy_file, mmap_mode=mode)
+
+            shape = (len(index['metrics']), len(index['dates']), len(index['countries']))
+
+            # Caught between replacing the array and its sidecar
+            # by a writer, the sidecar is replaced next
+            if self.values.shape == shape:
+                break
+        else:
+            raise ValueError(f'Shape of {npy_file} does not match {json_file}')
+
+        self.metrics = index['metrics']
+        self.dates = pd.DatetimeIndex(index['dates'])
+        self.countries = index['countries']
+        self.source_hashes = index.get('source_hashes')
+
+        self._metric_pos = {m: i for i, m in enumerate(self.metrics)}
+        self._country_pos = {c: i for i, c in enumerate(self.countries)}
+
+    @classmethod
+    def create(cls, path, dates, countries, metrics=METRICS, name='cases', dtype=np.int64, source_hashes=None):
+        """
+
+        Create an empty matrix in temporary files, open for writing.
+        It replaces the matrix named `name` on `commit`.
+
+        Matrices computed from another one keep `source_hashes`
+        of its dates, see `hash_dates`.
+
+        """
+
+        files = list()
+
+        for ext in ['npy', 'json']:
+            fd, file_name = tempfile.mkstemp(dir=path, prefix=f'.{name}.', suffix=f'.{ext}.tmp')
+            os.close(fd)
+            files.append(file_name)
+
+        npy_file, json_file = files
+
+        shape = (len(metrics), len(dates), len(countries))
+        values = np.lib.format.open_memmap(npy_file, mode='w+', dtype=dtype, shape=shape)
+        del values
+
+        index = {'metrics': list(metrics),
+                 'dates': [str(d.date()) for d in pd.DatetimeIndex(dates)],
+                 'countries': list(countries)}
+
+        if source_hashes is not None:
+            index['source_hashes'] = list(source_hashes)
+
+        with open(json_file, 'w') as f:
+            json.dump(index, f)
+
+        matrix = cls.__new__(cls)
+        matrix.path = path
+        matrix.name = name
+        matrix._pending = (npy_file, json_file)
+        matrix._open(npy_file=npy_file, json_file=json_file, mode='r+')
+
+        return matrix
+
+    @classmethod
+    def from_frames(cls, path, frames, name='cases', dtype=np.int64):
+        """
+
+        Write wide dataframes, one per metric, with the same
+        `Date` column and countries.
+
+        """
+
+        first = next(iter(frames.values()))
+        countries = first.drop('Date', axis=1).columns.to_list()
+
+        matrix = cls.create(path=path,
+                            dates=first['Date'],
+                            countries=countries,
+                            metrics=list(frames),
+                            name=name,
+                            dtype=dtype)
+
+        for i, df in enumerate(frames.values()):
+            matrix.values[i] = df[countries].to_numpy()
+
+        matrix.commit()
+
+        return matrix
+
+    def flush(self):
+
+        if isinstance(self.values, np.memmap):
+            self.values.flush()
+
+    def commit(self):
+        """
+
+        Flush a matrix made with `create` and move it in place of
+        the previous one, the array first and then its sidecar.
+
+        """
+
+        self.flush()
+
+        if self._pending is not None:
+            npy_file, json_file = self._pending
+
+            # Temporary files are only readable by their owner
+            for file_name in self._pending:
+                os.chmod(file_name, 0o644)
+
+            os.replace(npy_file, f'{self.path}/{self.name}.npy')
+            os.replace(json_file, f'{self.path}/{self.name}.json')
+            self._pending = None
+
+    def metric(self, metric):
+        """
+
+        View of one metric, shape (date, country).
+
+        """
+
+        return self.values[self._metric_pos[metric]]
+
+    def country(self, country):
+        """
+
+        View of one country, shape (metric, date).
+
+        """
+
+        return self.values[:, :, self._country_pos[country]]
+
+    def date_slice(self, start=None, end=None):
+        """
+
+        Positions of dates between `start` and `end`, inclusive.
+
+        """
+
+        i0 = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side='left')
+        i1 = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+
+        return slice(i0, i1)
+
+    def date_range(self, start=None, end=None):
+        """
+
+        View of dates between `start` and `end`, shape (metric, date, country).
+
+        """
+
+        return self.values[:, self.date_slice(start, end)]
+
+    def get(self, metric=None, country=None, start=None, end=None):
+        """
+
+        View of any combination of metric, country and date range.
+
+        """
+
+        m = slice(None) if metric is None else self._metric_pos[metric]
+        c = slice(None) if country is None else self._country_pos[country]
+
+        return self.values[m, self.date_slice(start, end), c]
+
+    def country_frame(self, country):
+        """
+
+        Dataframe with all metrics of one country.
+
+        """
+
+        df = pd.DataFrame(self.country(country).T, columns=self.metrics)
+        df.insert(0, 'Date', self.dates)
+
+        return df
+
+    def to_frame(self, metric):
+        """
+
+        Wide dataframe of one metric, as written by `make_cases`.
+
+        """
+
+        df = pd.DataFrame(self.metric(metric), columns=self.countries)
+        df.insert(0, 'Date', self.dates)
+
+        return df
+
+def hash_dates(values):
+    """
+    Hash of all values on each date of a
+    (metric, date, country) array.
+    """
+
+    return [hashlib.blake2b(np.ascontiguousarray(values[:, i]).tobytes(), digest_size=8).hexdigest()
+            for i in range(values.shape[1])]
+
+def read_previous(path, name, dates, countries, metrics, revision_days=REVISION_DAYS, source_hashes=None):
+    """
+    Get values of a matrix written in a previous run, if it
+    covers the first dates of `dates` for the same countries
+    and metrics. The last `revision_days` are left out.
+
+    With `source_hashes` of the dates of the matrix it is
+    computed from, dates from the first one whose source
+    values changed since the previous run are left out too.
+    Values on a date must only depend on source values up
+    to that date.
+
+    Returns a copy of the values that can be reused, or None.
+    """
+
+    try:
+        previous = CasesMatrix(path=path, name=name)
+    except FileNotFoundError:
+        return None
+
+    n = len(previous.dates)
+
+    if (previous.countries != list(countries)
+            or previous.metrics != list(metrics)
+            or n > len(dates)
+            or not previous.dates.equals(pd.DatetimeIndex(dates[:n]))):
+        return None
+
+    n_reused = max(n - revision_days, 0)
+
+    if source_hashes is not None:
+        if previous.source_hashes is None:
+            return None
+
+        changed = [i for i, (old, new) in enumerate(zip(previous.source_hashes[:n_reused], source_hashes)) if old != new]
+
+        if changed:
+            n_reused = changed[0]
+            print(f'Source of {name} revised on {previous.dates[n_reused].date()}, recomputing from there.')
+
+    return np.array(previous.values[:, :n_reused])
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# Alternative country names -> name used in processed data.
+ALIASES = {
+    # COVID-19 data
+    'Taiwan*': 'Taiwan',
+    'Korea, South': 'Korea',
+    'North Macedonia': 'Macedonia',
+    'Cabo Verde': 'Cape Verde',
+    'Congo (Brazzaville)': 'Congo',
+    'Congo (Kinshasa)': 'Congo',
+    # countries.csv from datahub
+    'Russian Federation': 'Russia',
+    'Slovakia (Slovak Republic)': 'Slovakia',
+    'Kyrgyz Republic': 'Kyrgyzstan',
+    'Syrian Arab Republic': 'Syria',
+    'Libyan Arab Jamahiriya': 'Libya',
+    'Brunei Darussalam': 'Brunei',
+    'Holy See (Vatican City State)': 'Holy See',
+    'United States of America': 'US',
+    'United Kingdom of Great Britain & Northern Ireland': 'United Kingdom',
+    "Lao People's Democratic Republic": 'Laos',
+    'Myanmar': 'Burma',
+    'Czech Republic': 'Czechia',
+    'Swaziland': 'Eswatini',
+}
+
+class CountryRegistry(object):
+    """
+
+    Map country names from all data sources to one name
+    and a three letter ISO code.
+
+    Inputs
+    ------
+    aliases : dict
+        Alternative name -> name used in processed data.
+    codes : dict
+        Name -> three letter country code.
+
+    Notes
+    -----
+    Lookups hash each distinct name once and broadcast
+    the result back to all rows.
+
+    """
+
+    def __init__(self, aliases=ALIASES, codes=None):
+
+        self.aliases = dict(aliases)
+        self.codes = dict(codes or {})
+
+    @staticmethod
+    def _map(names, mapping, keep_missing=True):
+
+        codes, uniques = pd.factorize(pd.Series(names))
+
+        if keep_missing:
+            mapped = [mapping.get(x, x) for x in uniques]
+        else:
+            mapped = [mapping.get(x) for x in uniques]
+
+        mapped = np.asarray(mapped + [None], dtype=object)
+
+        return mapped[codes]
+
+    def normalize(self, names):
+        """
+
+        Replace aliases with canonical names, returns a categorical.
+
+        """
+
+        return pd.Categorical(self._map(names, self.aliases))
+
+    def add_codes(self, names, codes):
+        """
+
+        Register three letter codes of countries.
+
+        """
+
+        names = self._map(names, self.aliases)
+
+        for name, code in zip(names, codes):
+            if not pd.isnull(code):
+                self.codes.setdefault(name, code)
+
+    def iso3(self, names):
+        """
+
+        Three letter codes of countries, None if unknown.
+
+        """
+
+        names = self._map(names, self.aliases)
+
+        return pd.Categorical(self._map(names, self.codes, keep_missing=False))
+
+REGISTRY = CountryRegistry()
+
+def normalize_countries(names):
+    """
+    Replace country aliases with names used in processed data.
+    """
+
+    return REGISTRY.normalize(names)
@@ -0,0 +1,295 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Recorder of the current process, None when disabled
+_RECORDER = None
+
+_NULL = nullcontext()
+
+# Functions listed per stage in profile mode
+PROFILE_LINES = 30
+
+def read_status(field):
+    """
+    Value of a kB field of /proc/self/status in MB,
+    None where it is not available.
+    """
+
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1]) / 2 ** 10
+    except OSError:
+        pass
+
+    return None
+
+def get_rss():
+    """
+    Resident set size of this process in MB, None if unknown.
+    """
+
+    return read_status('VmRSS')
+
+def get_peak_rss():
+    """
+    Peak resident set size of this process in MB,
+    since it started or the last `reset_peak_rss`.
+    """
+
+    # ru_maxrss survives exec, so a spawned worker would report
+    # the peak of its parent. VmHWM starts anew with the process.
+    peak = read_status('VmHWM')
+
+    if peak is not None:
+        return peak
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Reported in bytes on macOS, in kB elsewhere
+    if sys.platform == 'darwin':
+        return rss / 2 ** 20
+
+    return rss / 2 ** 10
+
+def reset_peak_rss():
+    """
+    Reset peak RSS to the current RSS, returns False
+    where the kernel doesn't allow it.
+    """
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+
+    return True
+
+class Recorder(object):
+    """
+
+    Collect timings of pipeline stages and of named steps
+    within them.
+
+    Inputs
+    ------
+    profile : bool
+        Run each stage under cProfile and keep the
+        most expensive functions.
+    trace_memory : bool
+        Track Python and numpy allocations with tracemalloc
+        to get peak memory of every stage and step.
+
+    Notes
+    -----
+    Each stage or step is a dict with wall and CPU time in
+    seconds, peak RSS while it ran and its increase over RSS
+    at its start, counters such as bytes read and written,
+    and its sub-steps.
+
+    Peak RSS is reset at the start of every step where Linux
+    allows it, otherwise it is the peak of the process so far.
+
+    """
+
+    def __init__(self, profile=False, trace_memory=False):
+
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.stages = list()
+        self._stack = list()
+
+    @property
+    def options(self):
+
+        return {'profile': self.profile, 'trace_memory': self.trace_memory}
+
+    @contextmanager
+    def step(self, name):
+        """
+
+        Record a named step, nested in the current one.
+
+        """
+
+        record = {'name': name, 'counters': dict(), 'steps': list()}
+        (self._stack[-1]['steps'] if self._stack else self.stages).append(record)
+        self._stack.append(record)
+
+        if self.trace_memory:
+            # Peak of the enclosing step before this one started
+            outer_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+
+        # Same for RSS, when it can be reset
+        outer_rss_peak = get_peak_rss()
+        reset_rss = reset_peak_rss()
+        start_rss = get_rss() or get_peak_rss()
+
+        start, start_cpu = time.perf_counter(), time.process_time()
+
+        try:
+            yield record
+        finally:
+            record['wall_time'] = time.perf_counter() - start
+            record['cpu_time'] = time.process_time() - start_cpu
+
+            rss_peak = max(get_peak_rss(), record.pop('_rss_peak', 0))
+            record['peak_rss_mb'] = rss_peak
+            record['peak_rss_delta_mb'] = max(rss_peak - start_rss, 0)
+
+            if reset_rss and len(self._stack) > 1:
+                parent = self._stack[-2]
+                parent['_rss_peak'] = max(parent.get('_rss_peak', 0), outer_rss_peak, rss_peak)
+
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], record.pop('_peak', 0))
+                record['peak_traced_mb'] = peak / 2 ** 20
+
+                if len(self._stack) > 1:
+                    parent = self._stack[-2]
+                    parent['_peak'] = max(parent.get('_peak', 0), outer_peak, peak)
+
+            self._stack.pop()
+
+    @contextmanager
+    def stage(self, name):
+        """
+
+        Record a pipeline stage, profiling it if requested.
+
+        """
+
+        started = self.trace_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+
+        profiler = cProfile.Profile() if self.profile else None
+
+        try:
+            with self.step(name) as record:
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    yield record
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            if started:
+                tracemalloc.stop()
+
+        if profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+            record['profile'] = out.getvalue()
+
+    def count(self, **counters):
+        """
+
+        Add to counters of the current step and
+        all steps enclosing it.
+
+        """
+
+        for record in self._stack:
+            for key, value in counters.items():
+                record['counters'][key] = record['counters'].get(key, 0) + value
+
+    def shape(self, df):
+        """
+
+        Note rows and columns of data processed in the current step.
+
+        """
+
+        if self._stack:
+            self._stack[-1]['rows'], self._stack[-1]['columns'] = df.shape
+
+    def add_stage(self, record):
+        """
+
+        Add a stage recorded in another process.
+
+        """
+
+        self.stages.append(record)
+
+    def report(self):
+
+        return {'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'options': self.options,
+                'wall_time': sum(stage['wall_time'] for stage in self.stages),
+                'stages': self.stages}
+
+    def write(self, path):
+
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+def enable(profile=False, trace_memory=False):
+    """
+    Start recording in this process.
+    """
+
+    global _RECORDER
+    _RECORDER = Recorder(profile=profile, trace_memory=trace_memory)
+
+    return _RECORDER
+
+def disable():
+    """
+    Stop recording, returns the recorder.
+    """
+
+    global _RECORDER
+    recorder, _RECORDER = _RECORDER, None
+
+    return recorder
+
+def get_recorder():
+
+    return _RECORDER
+
+def stage(name):
+    """
+    Context recording a pipeline stage, no-op when disabled.
+    """
+
+    return _NULL if _RECORDER is None else _RECORDER.stage(name)
+
+def step(name):
+    """
+    Context recording a named step, no-op when disabled.
+    """
+
+    return _NULL if _RECORDER is None else _RECORDER.step(name)
+
+def count(**counters):
+
+    if _RECORDER is not None:
+        _RECORDER.count(**counters)
+
+def count_file(path, key='bytes_read', df=None):
+    """
+    Count size of a file read or written in the current step,
+    and shape of its data.
+    """
+
+    if _RECORDER is None:
+        return
+
+    _RECORDER.count(**{key: os.path.getsize(path)})
+
+    if df is not None:
+        _RECORDER.shape(df)
@@ -1,12 +1,21 @@
+import argparse
+
+import instrument
 from make_cases import make_cases
-from make_cases_daily_change import make_cases_daily_change
+from make_cases_daily_change import ROLLING_WINDOWS, make_cases_daily_change
 from make_cases_since_t0 import make_cases_since_t0
 from make_continents import make_continents
 from make_coordinates import make_coordinates
 from make_country_stats import make_country_stats
 from make_country_to_continent import make_country_to_continent
+from make_growth_rates import GROWTH_WINDOWS, make_growth_rates
 from make_mortality import make_mortality
-from make_world_bank import make_world_bank
+from make_rollups import make_rollups
+from make_us_cases import make_us_cases
+from make_world_bank import INDICATORS, make_world_bank
+from make_world_bank_panel import make_world_bank_panel
+from pipeline import MANIFEST_NAME, Pipeline, Stage
+from storage import BACKENDS, DEFAULT_BACKEND, CSVStore, export, get_store
 
 # Inputs
 datahub_path = './data/raw/datahub'
@@ -16,23 +25,138 @@ world_bank_path = './data/raw/world_bank'
 # Outputs
 out_path = './data/processed'
 
-# Datasets generated from raw data
-make_cases(in_path=covid_path, out_path=out_path)
+def files(path, names):
+
+    return [f'{path}/{name}' for name in names]
+
+def get_stages(backend=DEFAULT_BACKEND):
+    """
+    List pipeline stages with the files they read and write.
+    """
+
+    store = get_store(out_path, backend)
+    processed = lambda *names: [store.file_name(name) for name in names]
+
+    covid_files = files(covid_path, [f'time_series_covid19_{x}_global.csv'
+                                     for x in ['confirmed', 'recovered', 'deaths']])
+
+    stages = [
+        # Datasets generated from raw data
+        Stage(make_cases,
+              inputs=covid_files,
+              outputs=(processed('confirmed_cases', 'recovered_cases', 'dead_cases', 'active_cases')
+                       + files(out_path, ['cases.npy', 'cases.json'])),
+              in_path=covid_path, out_path=out_path, backend=backend),
+        Stage(make_us_cases,
+              inputs=files(covid_path, [f'time_series_covid19_{x}_US.csv' for x in ['confirmed', 'deaths']]),
+              outputs=(processed('us_regions', 'us_cases', 'us_state_confirmed_cases', 'us_state_dead_cases',
+                                 'us_state_confirmed_cases_daily_change', 'us_state_confirmed_cases_since_t0',
+                                 'us_state_mortality_rate')
+                       + files(out_path, ['us_counties.npy', 'us_counties.json',
+                                          'us_rollups.npy', 'us_rollups.json'])),
+              in_path=covid_path, out_path=out_path, backend=backend),
+        Stage(make_coordinates,
+              inputs=covid_files[:1],
+              outputs=processed('coordinates'),
+              in_path=covid_path, out_path=out_path, backend=backend),
+        Stage(make_continents,
+              inputs=files(datahub_path, ['countries.csv']),
+              outputs=processed('continents'),
+              in_path=datahub_path, out_path=out_path, backend=backend),
+        # Datasets generate from cleaned data
+        Stage(make_cases_since_t0,
+              inputs=processed('confirmed_cases', 'recovered_cases', 'dead_cases'),
+              outputs=processed('confirmed_cases_since_t0'),
+              in_path=out_path, out_path=out_path, backend=backend),
+        Stage(make_cases_daily_change,
+              inputs=files(out_path, ['cases.npy', 'cases.json']),
+              outputs=(processed('confirmed_cases_daily_change')
+                       + files(out_path, [f'daily_change{suffix}.{ext}'
+                                          for suffix in [''] + [f'_{n}d' for n in ROLLING_WINDOWS]
+                                          for ext in ['npy', 'json']])),
+              in_path=out_path, out_path=out_path, backend=backend),
+        Stage(make_mortality,
+              inputs=processed('confirmed_cases', 'recovered_cases', 'dead_cases'),
+              outputs=processed('mortality_rate'),
+              in_path=out_path, out_path=out_path, backend=backend),
+        Stage(make_country_stats,
+              inputs=files(out_path, ['cases.npy', 'cases.json']),
+              outputs=processed('country_stats'),
+              in_path=out_path, out_path=out_path, backend=backend),
+        Stage(make_country_to_continent,
+              inputs=processed('continents', 'coordinates'),
+              outputs=processed('country_to_continent'),
+              in_path=out_path, out_path=out_path, backend=backend),
+        Stage(make_rollups,
+              inputs=files(out_path, ['cases.npy', 'cases.json']) + processed('continents', 'coordinates'),
+              outputs=files(out_path, ['rollups.npy', 'rollups.json']),
+              in_path=out_path, out_path=out_path, backend=backend),
+        Stage(make_growth_rates,
+              inputs=files(out_path, ['cases.npy', 'cases.json', 'rollups.npy', 'rollups.json']),
+              outputs=(processed('doubling_times')
+                       + files(out_path, [f'{name}_growth_{n}d.{ext}'
+                                          for name in ['cases', 'rollups']
+                                          for n in GROWTH_WINDOWS
+                                          for ext in ['npy', 'json']])),
+              in_path=out_path, out_path=out_path, backend=backend),
+        # Merge COVID-19 data with World Bank data
+        Stage(make_world_bank,
+              inputs=(files(world_bank_path, [f'{x}.csv' for x in INDICATORS])
+                      + processed('continents', 'country_stats')
+                      + files(out_path, ['world_bank_codes.csv'])),
+              outputs=processed('world_bank', 'world_bank_indicators'),
+              in_path=world_bank_path, out_path=out_path, backend=backend),
+        Stage(make_world_bank_panel,
+              inputs=files(out_path, ['cases.npy', 'cases.json']) + processed('world_bank_indicators', 'continents'),
+              outputs=processed('world_bank_panel'),
+              in_path=out_path, out_path=out_path, backend=backend),
+    ]
+
+    return stages
+
+def positive_int(value):
+    """
+    Parse an integer argument of at least 1.
+    """
+
+    n = int(value)
+
+    if n < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, got {value}')
 
-make_coordinates(in_path=covid_path, out_path=out_path)
+    return n
 
-make_continents(in_path=datahub_path, out_path=out_path)
+if __name__ == '__main__':
 
-# Datasets generate from cleaned data
-make_cases_since_t0(in_path=out_path, out_path=out_path)        
+    parser = argparse.ArgumentParser(description='Build processed datasets.')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild all datasets, even if inputs are unchanged.')
+    parser.add_argument('--jobs', type=positive_int, default=1,
+                        help='Number of stages to run at the same time.')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help='File format of processed datasets.')
+    parser.add_argument('--export', metavar='PATH',
+                        help='Also copy processed datasets to csv files in PATH.')
+    parser.add_argument('--report', metavar='PATH',
+                        help='Write timings of stages and their steps to a json file.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Add cProfile output of each stage to the report.')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Add peak memory traced with tracemalloc to the report.')
+    args = parser.parse_args()
 
-make_cases_daily_change(in_path=out_path, out_path=out_path)
+    if (args.profile or args.trace_memory) and not args.report:
+        parser.error('--profile and --trace-memory require --report')
 
-make_mortality(in_path=out_path, out_path=out_path)
+    if args.report:
+        instrument.enable(profile=args.profile, trace_memory=args.trace_memory)
 
-make_country_stats(in_path=out_path, out_path=out_path)
+    pipeline = Pipeline(stages=get_stages(backend=args.backend),
+                        manifest_path=f'{out_path}/{MANIFEST_NAME}')
+    pipeline.run(force=args.force, jobs=args.jobs)
 
-make_country_to_continent(in_path=out_path, out_path=out_path)           
+    if args.report:
+        instrument.disable().write(args.report)
 
-# Merge COVID-19 data with World Bank data
-make_world_bank(in_path=world_bank_path, out_path=out_path)
+    if args.export:
+        export(src=get_store(out_path, args.backend), dst=CSVStore(args.export))
@@ -1,80 +1,176 @@
+import numpy as np
 import pandas as pd
 
-from utils import remove_boats, rename_countries
+from cases_matrix import METRICS, CasesMatrix
+from instrument import count_file, step
+from storage import DEFAULT_BACKEND, get_store
+from utils import BOATS, rename_countries
 
-def read_data(path):
+# Rows of the raw files read at a time
+CHUNK_SIZE = 1000
+
+def get_date_columns(columns):
+    """
+    Find columns with dates, eg. 1/22/20.
+    """
+
+    dates = pd.to_datetime(pd.Index(columns), format='%m/%d/%y', errors='coerce')
+
+    return [col for col, date in zip(columns, dates) if not pd.isnull(date)]
+
+def read_chunks(file_name, country_column='Country/Region', chunksize=CHUNK_SIZE, keys=None, value_dtype=np.int64):
+    """
+    Read key columns and daily cases from a raw time series
+    file, `chunksize` rows at a time.
+
+    `keys` maps key columns to their dtypes, by default only
+    `country_column` is read, as str, and renamed to Country.
+    Cases are `value_dtype`, blank cells are 0.
+    """
+
+    count_file(file_name)
+
+    if keys is None:
+        keys, names = {country_column: str}, {country_column: 'Country'}
+    else:
+        names = dict()
+
+    columns = pd.read_csv(file_name, nrows=0).columns.to_list()
+    dates = get_date_columns(columns)
+
+    # Read as float, blank cells occur in the raw files
+    dtype = {col: np.float64 for col in dates}
+    dtype.update(keys)
+
+    chunks = pd.read_csv(file_name,
+                         usecols=list(keys) + dates,
+                         dtype=dtype,
+                         chunksize=chunksize)
+
+    for chunk in chunks:
+        chunk[dates] = chunk[dates].fillna(0).astype(value_dtype)
+        yield chunk.rename(columns=names)
+
+def read_data(path, chunksize=CHUNK_SIZE):
     """
     Read data from ../data/COVID-19
     """
 
-    conf = pd.read_csv(f'{path}/time_series_covid19_confirmed_global.csv')
-    recov = pd.read_csv(f'{path}/time_series_covid19_recovered_global.csv')
-    dead = pd.read_csv(f'{path}/time_series_covid19_deaths_global.csv')
+    conf = read_chunks(f'{path}/time_series_covid19_confirmed_global.csv', chunksize=chunksize)
+    recov = read_chunks(f'{path}/time_series_covid19_recovered_global.csv', chunksize=chunksize)
+    dead = read_chunks(f'{path}/time_series_covid19_deaths_global.csv', chunksize=chunksize)
 
     return (conf, recov, dead)
 
-def process_data(df):
+def aggregate_chunks(chunks):
+    """
+    Sum cases by country while chunks are read,
+    only totals by country are kept in memory.
+    """
+
+    total = None
+
+    for chunk in chunks:
+        chunk = rename_countries(df=chunk)
+        chunk = chunk.groupby('Country').sum()
+
+        if total is not None:
+            chunk = pd.concat([total, chunk]).groupby(level=0).sum()
+
+        total = chunk
+
+    return total
+
+def to_long(total, name='Cases'):
+    """
+    Convert country totals to (Date, Country, `name`) rows.
+    """
+
+    dates = pd.to_datetime(total.columns, format='%m/%d/%y')
+
+    df = pd.DataFrame({'Date': np.tile(dates, len(total)),
+                       'Country': pd.Categorical(np.repeat(total.index, len(dates))),
+                       name: total.to_numpy().ravel()})
+
+    return df
+
+def to_wide(total):
+    """
+    Convert country totals to one column per country.
+    """
+
+    df = pd.DataFrame(total.to_numpy().T, columns=total.index.to_list())
+    df.insert(0, 'Date', pd.to_datetime(total.columns, format='%m/%d/%y'))
+
+    return df
+
+def process_data(df, long=False):
     """    
     Convert data from columns to rows.    
+
+    Accepts a raw dataframe or chunks from `read_chunks`.
     """
-    
-    # Drop columns
-    df = df.drop(['Lat', 'Long', 'Province/State'], axis=1)
-    df = df.rename(columns={"Country/Region": "Country"})    
-    
-    # Rename countries
-    df = rename_countries(df=df)
-    
+
+    if isinstance(df, pd.DataFrame):
+        df = df.drop(['Lat', 'Long', 'Province/State'], axis=1)
+        df = df.rename(columns={"Country/Region": "Country"})
+        df = [df]
+
     # Enforce countries are unique
-    df = df.groupby('Country', as_index=False).sum()        
-    
-    # Switch to colum format
-    df = df.transpose()
-    
-    # Copy headers from first row
-    df.columns = df.iloc[0, :].to_list()
-    df['Date'] = df.index
-    df = df[1:]    
-
-    # Drop boats
-    df = remove_boats(df=df)    
-    
-    # Convert dates
-    df['Date'] = pd.to_datetime(df['Date'])
-    
-    # Convert to ints
-    cols = df.columns.to_list()
-    cols.remove('Date')
-    for col in cols:
-        df[col] = df[col].astype(int)
-    
-    # Reorder & Sort    
-    cols = ['Date'] + sorted(cols)
-    df = df[cols]
-        
-    # Reset index
-    df = df.reset_index(drop=True)
-    df.head()    
-    
-    return df    
-
-def make_cases(in_path, out_path):
+    total = aggregate_chunks(chunks=df)
+
+    # Drop boats & sort
+    total = total.drop(BOATS, errors='ignore')
+    total = total.sort_index()
+
+    if long:
+        return to_long(total=total)
+
+    return to_wide(total=total)
+
+def align_cases(df, like):
+    """
+    Reindex cases to the dates and countries of `like`,
+    with 0 where `df` has none.
+    """
+
+    df = df.set_index('Date').reindex(index=like['Date'], columns=like.columns.drop('Date'), fill_value=0)
+
+    return df.reset_index()
+
+def make_cases(in_path, out_path, backend=DEFAULT_BACKEND):
 
     conf, recov, dead = read_data(path=in_path)
 
-    conf = process_data(df=conf)
-    recov = process_data(df=recov)
-    dead = process_data(df=dead)
+    with step('aggregate confirmed'):
+        conf = process_data(df=conf)
+    with step('aggregate recovered'):
+        recov = process_data(df=recov)
+    with step('aggregate dead'):
+        dead = process_data(df=dead)
+
+    countries = conf.drop('Date', axis=1).columns.to_list()
+
+    matrix = CasesMatrix.create(path=out_path, dates=conf['Date'], countries=countries)
+
+    # Recovered and dead can lack countries or dates
+    for metric, df in zip(METRICS, [conf, recov, dead]):
+        matrix.metric(metric)[:] = align_cases(df=df, like=conf)[countries].to_numpy()
+
+    # Active cases are computed in place in the mapped matrix
+    with step('active cases'):
+        active = matrix.metric('Active')
+        np.subtract(matrix.metric('Confirmed'), matrix.metric('Recovered'), out=active)
+        np.subtract(active, matrix.metric('Dead'), out=active)
+        matrix.commit()
 
-    active = conf.drop(['Date'], axis=1) 
-    active -= recov.drop(['Date'], axis=1) 
-    active -= dead.drop(['Date'], axis=1)
-    active['Date'] = conf['Date']
+    active = matrix.to_frame('Active')
 
-    conf.to_csv(f'{out_path}/confirmed_cases.csv', index=False)
-    recov.to_csv(f'{out_path}/recovered_cases.csv', index=False)
-    dead.to_csv(f'{out_path}/dead_cases.csv', index=False)
-    active.to_csv(f'{out_path}/active_cases.csv', index=False)
+    store = get_store(out_path, backend)
+    store.write(conf, 'confirmed_cases')
+    store.write(recov, 'recovered_cases')
+    store.write(dead, 'dead_cases')
+    store.write(active, 'active_cases')
 
 if __name__ == '__main__':
 
@@ -1,29 +1,149 @@
-from functools import reduce
-
+import numpy as np
 import pandas as pd
 
-from utils import read_data
+from cases_matrix import CasesMatrix, hash_dates, read_previous
+from instrument import step
+from storage import DEFAULT_BACKEND, get_store
+
+# Windows of precomputed rolling averages, in days
+ROLLING_WINDOWS = (7, 14)
 
-def get_daily_changes(df):   
+def get_daily_changes(df):
     """
-    
+
     Calculate daily change in case
     data, ie apply difference operator.
-    
+
     """
 
-    diff = df.drop(['Date'], axis=1) - df.drop(['Date'], axis=1).shift(1)
+    values = df.drop(['Date'], axis=1)
+
+    diff = np.zeros(values.shape)
+    diff[1:] = np.diff(values.to_numpy(), axis=0)
+
+    diff = pd.DataFrame(diff, columns=values.columns, index=df.index)
     diff['Date'] = df['Date']
-    diff = diff.fillna(0)
 
     return diff
 
-def make_cases_daily_change(in_path, out_path):
-    conf,_,_ = read_data(in_path)
+def diff_matrix(values, start=0):
+    """
+
+    Daily change of a (metric, date, country) array
+    for dates from `start` on, zero on the first date.
+
+    """
+
+    diff = np.zeros((values.shape[0], values.shape[1] - start, values.shape[2]), dtype=values.dtype)
+
+    lo = max(start - 1, 0)
+    diff[:, lo + 1 - start:] = np.diff(values[:, lo:], axis=1)
+
+    return diff
+
+def rolling_mean(values, window, start=0):
+    """
+
+    Rolling mean along dates of a (metric, date, country) array
+    for dates from `start` on, NaN for the first `window` - 1 dates.
+
+    Uses differences of cumulative sums, so each window
+    costs O(1) regardless of its length.
+
+    """
+
+    n_metrics, n_dates, n_countries = values.shape
+    lo = max(start - window + 1, 0)
+
+    csum = np.zeros((n_metrics, n_dates - lo + 1, n_countries))
+    np.cumsum(values[:, lo:], axis=1, out=csum[:, 1:])
+
+    upper = np.arange(start, n_dates) - lo + 1
+    lower = upper - window
+    full = lower >= 0
+
+    mean = np.full((n_metrics, n_dates - start, n_countries), np.nan)
+    mean[:, full] = (csum[:, upper[full]] - csum[:, lower[full]]) / window
+
+    return mean
+
+def update_matrix(path, name, cases, compute, dtype, full=False, source_hashes=None):
+    """
+
+    Write matrix `name` with the same shape as `cases`,
+    computing only dates missing from the previous run
+    or whose values in `cases` were revised since.
+
+    Inputs
+    ------
+    compute : callable
+        Called with index of first date to compute,
+        returns values from that date on.
+    source_hashes : list
+        Hashes of dates of `cases`, see `hash_dates`,
+        computed if not given.
+
+    """
+
+    if source_hashes is None:
+        source_hashes = hash_dates(cases.values)
+
+    previous = None if full else read_previous(path=path,
+                                               name=name,
+                                               dates=cases.dates,
+                                               countries=cases.countries,
+                                               metrics=cases.metrics,
+                                               source_hashes=source_hashes)
+    n_known = 0 if previous is None else previous.shape[1]
+
+    matrix = CasesMatrix.create(path=path,
+                                dates=cases.dates,
+                                countries=cases.countries,
+                                metrics=cases.metrics,
+                                name=name,
+                                dtype=dtype,
+                                source_hashes=source_hashes)
+
+    if n_known:
+        matrix.values[:, :n_known] = previous
+
+    matrix.values[:, n_known:] = compute(n_known)
+    matrix.commit()
+
+    return matrix
+
+def make_cases_daily_change(in_path, out_path, backend=DEFAULT_BACKEND, windows=ROLLING_WINDOWS, full=False):
+
+    cases = CasesMatrix(path=in_path)
+
+    # Moving averages are computed from daily changes, which
+    # depend only on cases up to the same date
+    with step('hash cases'):
+        hashes = hash_dates(cases.values)
+
+    with step('daily change'):
+        diff = update_matrix(path=out_path,
+                             name='daily_change',
+                             cases=cases,
+                             compute=lambda start: diff_matrix(cases.values, start=start),
+                             dtype=cases.values.dtype,
+                             full=full,
+                             source_hashes=hashes)
+
+    for window in windows:
+        with step(f'rolling mean {window}d'):
+            update_matrix(path=out_path,
+                          name=f'daily_change_{window}d',
+                          cases=cases,
+                          compute=lambda start: rolling_mean(diff.values, window=window, start=start),
+                          dtype=np.float64,
+                          full=full,
+                          source_hashes=hashes)
 
-    df = get_daily_changes(df=conf)
+    df = diff.to_frame('Confirmed')
+    df = df[df.columns[1:].to_list() + ['Date']]
 
-    df.to_csv(f'{out_path}/confirmed_cases_daily_change.csv', index=False)
+    get_store(out_path, backend).write(df, 'confirmed_cases_daily_change')
 
 
 if __name__ == '__main__':
@@ -32,4 +152,4 @@ if __name__ == '__main__':
     out_path = './data/processed'
 
     make_cases_daily_change(in_path=in_path,
-                        out_path=out_path)        
\ No newline at end of file
+                        out_path=out_path)
@@ -1,39 +1,101 @@
-from functools import reduce
-
+import numpy as np
 import pandas as pd
 
+from instrument import step
+from storage import DEFAULT_BACKEND, get_store
 from utils import read_data
 
-def get_cases_since_t0(df, n_cases_start=100):
+DEFAULT_THRESHOLD = 100
+
+def align_since_threshold(values, thresholds, n_days):
+    """
+    Shift each column of `values` so that row 0 is the first
+    day on which it reached a threshold.
+
+    Inputs
+    ------
+    values : np.ndarray
+        Cumulative cases, shape (dates, countries).
+    thresholds : list of ints
+        Number of cases defining day 0.
+    n_days : int
+        Number of days to keep after day 0.
+
+    Returns
+    -------
+    np.ndarray of shape (thresholds, n_days, countries), NaN
+    where a country has no data that many days after day 0.
+    """
+
+    values = np.asarray(values)
+    thresholds = np.asarray(thresholds)
+    n_dates, n_countries = values.shape
+
+    # Index of first crossing for every threshold and column,
+    # equal to n_dates when the threshold was never reached.
+    running_max = np.maximum.accumulate(values, axis=0)
+    first = (running_max[:, :, np.newaxis] < thresholds).sum(axis=0).T
+
+    days = np.arange(n_days)
+    cols = np.arange(n_countries)
+
+    aligned = np.full((len(thresholds), n_days, n_countries), np.nan)
+
+    for i, start in enumerate(first):
+        rows = start + days[:, np.newaxis]
+        valid = rows < n_dates
+        aligned[i][valid] = values[rows[valid], np.broadcast_to(cols, rows.shape)[valid]]
+
+    return aligned
+
+def get_cases_since_thresholds(df, thresholds, n_days=None):
+    """
+    Align cases on days since reaching each threshold.
+
+    Returns a dict of threshold -> dataframe. By default
+    each dataframe has at most `threshold` rows.
+    """
 
     all_countries = sorted(df.drop('Date', axis=1).columns)
+    values = df[all_countries].to_numpy()
+
+    max_days = max(thresholds) if n_days is None else n_days
+    aligned = align_since_threshold(values=values,
+                                    thresholds=thresholds,
+                                    n_days=max_days)
+
+    since_t0 = dict()
+    for threshold, matrix in zip(thresholds, aligned):
+        n = threshold if n_days is None else n_days
+
+        # Drop rows no country has reached yet
+        has_data = ~np.isnan(matrix[:n]).all(axis=1)
+        n = has_data.nonzero()[0].max() + 1 if has_data.any() else 0
+
+        since_t0[threshold] = pd.DataFrame(matrix[:n], columns=all_countries)
+
+    return since_t0
+
+def get_cases_since_t0(df, n_cases_start=DEFAULT_THRESHOLD):
+
+    return get_cases_since_thresholds(df=df, thresholds=[n_cases_start])[n_cases_start]
 
-    conf_t0 = list()
-    for country in all_countries:
-        t0 = df[[country]]
-        t0 = t0.loc[t0[country] >= n_cases_start]
-        t0 = t0.reset_index(drop=True)
-        conf_t0.append(t0)
-        
-    outer_join = lambda x, y: pd.merge(left=x, 
-                                       right=y, 
-                                       left_index=True, 
-                                       right_index=True, 
-                                       how='outer')
+def get_dataset_name(threshold):
 
-    conf_t0 = reduce(outer_join, conf_t0)    
-    conf_t0.columns = all_countries
-    conf_t0 = conf_t0.head(n_cases_start)
-    # conf_t0 = conf_t0.dropna(axis=1)
+    if threshold == DEFAULT_THRESHOLD:
+        return 'confirmed_cases_since_t0'
 
-    return conf_t0
+    return f'confirmed_cases_since_t0_{threshold}'
 
-def make_cases_since_t0(in_path, out_path):
-    conf,_,_ = read_data(in_path)
+def make_cases_since_t0(in_path, out_path, thresholds=(DEFAULT_THRESHOLD,), backend=DEFAULT_BACKEND):
+    conf,_,_ = read_data(in_path, backend)
+    store = get_store(out_path, backend)
 
-    df = get_cases_since_t0(df=conf)
+    with step('align'):
+        since_t0 = get_cases_since_thresholds(df=conf, thresholds=list(thresholds))
 
-    df.to_csv(f'{out_path}/confirmed_cases_since_t0.csv', index=False)
+    for threshold, df in since_t0.items():
+        store.write(df, get_dataset_name(threshold))
 
 
 if __name__ == '__main__':
@@ -42,4 +104,4 @@ if __name__ == '__main__':
     out_path = './data/processed'
 
     make_cases_since_t0(in_path=in_path,
-                        out_path=out_path)        
\ No newline at end of file
+                        out_path=out_path)
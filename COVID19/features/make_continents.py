@@ -1,10 +1,13 @@
 import pandas as pd
 
-from utils import rename_countries, BOATS
+from countries import normalize_countries
+from instrument import count_file
+from storage import DEFAULT_BACKEND, get_store
 
 def read_data(path):
 
     df = pd.read_csv(f'{path}/countries.csv')
+    count_file(f'{path}/countries.csv')
 
     return df
 
@@ -31,28 +34,11 @@ def switch_country_names(df):
     Change values in countries.csv to match covid data.
     """
 
-    to_swap = [('Russian Federation', 'Russia'),
-               ('Slovakia (Slovak Republic)', 'Slovakia'),
-               ('Kyrgyz Republic', 'Kyrgyzstan'),
-               ('Syrian Arab Republic', 'Syria'),
-               ('Libyan Arab Jamahiriya', 'Libya'),
-               ('Korea, South', 'Korea'),
-               ('Brunei Darussalam', 'Brunei'),
-               ('Cabo Verde', 'Cape Verde'),
-               ('Holy See (Vatican City State)', 'Holy See'),
-               ('United States of America', 'US'),
-               ('United Kingdom of Great Britain & Northern Ireland', 'United Kingdom'),
-               ("Lao People's Democratic Republic", 'Laos'),
-               ('Myanmar', 'Burma'),
-               ('Czech Republic', 'Czechia'),
-               ('Swaziland',  'Eswatini')]
-
-    for x in to_swap:
-        df.loc[df['Country'] == x[0], 'Country'] = x[1]
+    df['Country'] = normalize_countries(df['Country'])
 
     return df
 
-def make_continents(in_path, out_path):
+def make_continents(in_path, out_path, backend=DEFAULT_BACKEND):
 
     df = read_data(in_path)
     df = get_continents(df=df)
@@ -60,7 +46,7 @@ def make_continents(in_path, out_path):
 
     df = df[df['Continent'] != 'Antarctica']
 
-    df.to_csv(f'{out_path}/continents.csv', index=False)
+    get_store(out_path, backend).write(df, 'continents')
 
 if __name__ == '__main__':
 
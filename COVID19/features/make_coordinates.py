@@ -1,10 +1,13 @@
 import pandas as pd
 
+from instrument import count_file
+from storage import DEFAULT_BACKEND, get_store
 from utils import rename_countries, BOATS
 
 def read_data(path):
 
     df = pd.read_csv(f'{path}/time_series_covid19_confirmed_global.csv')
+    count_file(f'{path}/time_series_covid19_confirmed_global.csv')
 
     return df
 
@@ -24,12 +27,12 @@ def get_coords(df):
 
     return df
 
-def make_coordinates(in_path, out_path):
+def make_coordinates(in_path, out_path, backend=DEFAULT_BACKEND):
 
     df = read_data(in_path)
     df = get_coords(df=df)
     
-    df.to_csv(f'{out_path}/coordinates.csv', index=False)
+    get_store(out_path, backend).write(df, 'coordinates')
 
 if __name__ == '__main__':
 
@@ -1,43 +1,72 @@
-from functools import reduce
-
+import numpy as np
 import pandas as pd
 
-from utils import read_data
+from cases_matrix import CasesMatrix
+from instrument import step
+from storage import DEFAULT_BACKEND, get_store
+
+def get_date_positions(cases, dates):
+    """
+    Find rows of the latest data available on each of `dates`.
+    """
+
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    pos = cases.dates.searchsorted(dates, side='right') - 1
+
+    if (pos < 0).any():
+        raise KeyError(f'No data before {dates[pos < 0][0].date()}')
+
+    return pos
+
+def get_snapshots(cases, dates=None):
+    """
+    Create dataframe with cases summarized by country
+    on each of `dates`, the latest date by default.
+
+    Returns rows of (Date, Country, Confirmed, Recovered,
+    Dead, Active, Mortality).
+    """
+
+    pos = [len(cases.dates) - 1] if dates is None else get_date_positions(cases=cases, dates=dates)
+    n_dates, n_countries = len(pos), len(cases.countries)
+
+    # Shape (metric, date, country)
+    values = cases.values[:, pos, :]
+
+    stats = pd.DataFrame({'Date': np.repeat(cases.dates[pos], n_countries),
+                          'Country': np.tile(cases.countries, n_dates)})
+
+    for metric, v in zip(cases.metrics, values):
+        stats[metric] = v.ravel()
 
-def read_extra_data(path):
+    conf = stats['Confirmed'].to_numpy(dtype=np.float64)
+    dead = stats['Dead'].to_numpy(dtype=np.float64)
 
-    active = pd.read_csv(f'{path}/active_cases.csv')    
-    mort = pd.read_csv(f'{path}/mortality_rate.csv')        
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mort = np.where(conf > 0, dead / conf * 100, np.nan)
 
-    return (active, mort)
+    stats['Mortality'] = np.round(mort, 2)
 
-def get_country_stats(dataframes, names):
-    """    
-    Create dataframe with cases summarized by country.    
+    return stats
+
+def get_country_stats(cases, date=None):
+    """
+    Create dataframe with cases summarized by country.
     """
-    
-    stats = []
-    for df,name in zip(dataframes, names):
-        tmp = df.tail(1).drop('Date', axis=1)
-        tmp = tmp.transpose()
-        tmp = tmp.reset_index()
-        tmp.columns = ['Country', name]
-        stats.append(tmp)
-
-    stats = reduce(lambda x, y: pd.merge(x, y, on='Country', how='outer'), stats)    
-    
+
+    stats = get_snapshots(cases=cases, dates=None if date is None else [date])
+    stats = stats.drop('Date', axis=1)
+
     return stats
 
-def make_country_stats(in_path, out_path):
+def make_country_stats(in_path, out_path, backend=DEFAULT_BACKEND):
 
-    dataframes = list(read_data(path=in_path))
-    dataframes += list(read_extra_data(path=in_path))
-    
-    names = ['Confirmed', 'Recovered', 'Dead', 'Active', 'Mortality']
+    cases = CasesMatrix(path=in_path)
 
-    stats = get_country_stats(dataframes=dataframes, names=names)    
+    with step('snapshot'):
+        stats = get_country_stats(cases=cases)
 
-    stats.to_csv(f'{out_path}/country_stats.csv', index=False)
+    get_store(out_path, backend).write(stats, 'country_stats')
 
 if __name__ == '__main__':
 
@@ -45,4 +74,4 @@ if __name__ == '__main__':
     out_path = './data/processed'
 
     make_country_stats(in_path=in_path,
-                   out_path=out_path)    
\ No newline at end of file
+                   out_path=out_path)
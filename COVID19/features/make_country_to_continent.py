@@ -1,9 +1,13 @@
 import pandas as pd
 
-def read_data(path):
+from storage import DEFAULT_BACKEND, get_store
 
-    countries = pd.read_csv(f'{path}/continents.csv')
-    coordinates = pd.read_csv(f'{path}/coordinates.csv')
+def read_data(path, backend=DEFAULT_BACKEND):
+
+    store = get_store(path, backend)
+
+    countries = store.read('continents')
+    coordinates = store.read('coordinates')
 
     return (countries,coordinates)
 
@@ -14,12 +18,12 @@ def get_ctry_to_cont(ctry, coord):
     
     return df
 
-def make_country_to_continent(in_path, out_path):
+def make_country_to_continent(in_path, out_path, backend=DEFAULT_BACKEND):
     
-    ctry, coord = read_data(path=in_path)
+    ctry, coord = read_data(path=in_path, backend=backend)
     df = get_ctry_to_cont(ctry=ctry, coord=coord)
 
-    df.to_csv(f'{out_path}/country_to_continent.csv', index=False)
+    get_store(out_path, backend).write(df, 'country_to_continent')
 
 if __name__ == '__main__':
 
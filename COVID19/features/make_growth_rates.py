@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+from cases_matrix import CasesMatrix, hash_dates
+from instrument import step
+from make_cases_daily_change import update_matrix
+from make_rollups import WORLD
+from storage import DEFAULT_BACKEND, get_store
+
+# Windows of rolling growth rate fits, in days
+GROWTH_WINDOWS = (7, 14)
+
+def rolling_log_slope(values, window, start=0):
+    """
+
+    Daily growth rate of a (metric, date, country) array, ie slope
+    of a least squares line through the log of values in each window
+    along dates ending at dates from `start` on.
+
+    NaN for the first `window` - 1 dates and for windows
+    with any value that is not positive.
+
+    Uses differences of cumulative sums of log values and of
+    log values times date position, so each window costs O(1)
+    regardless of its length.
+
+    """
+
+    n_metrics, n_dates, n_countries = values.shape
+    lo = max(start - window + 1, 0)
+
+    y = np.asarray(values[:, lo:], dtype=np.float64)
+    valid = y > 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y = np.where(valid, np.log(y), 0.)
+
+    # Date positions relative to `lo`, keeps sums small
+    t = np.arange(n_dates - lo, dtype=np.float64)[:, None]
+
+    shape = (n_metrics, n_dates - lo + 1, n_countries)
+    csum_y, csum_ty, csum_invalid = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+
+    np.cumsum(y, axis=1, out=csum_y[:, 1:])
+    np.cumsum(t * y, axis=1, out=csum_ty[:, 1:])
+    np.cumsum(~valid, axis=1, out=csum_invalid[:, 1:])
+
+    upper = np.arange(start, n_dates) - lo + 1
+    lower = upper - window
+    full = lower >= 0
+    upper, lower = upper[full], lower[full]
+
+    sum_y = csum_y[:, upper] - csum_y[:, lower]
+    sum_ty = csum_ty[:, upper] - csum_ty[:, lower]
+    n_invalid = csum_invalid[:, upper] - csum_invalid[:, lower]
+
+    # Mean and sum of squared deviations of positions in a window
+    t_mean = (upper - 1 - (window - 1) / 2)[:, None]
+    t_ss = window * (window * window - 1) / 12
+
+    slope = np.full((n_metrics, n_dates - start, n_countries), np.nan)
+    slope[:, full] = np.where(n_invalid == 0, (sum_ty - t_mean * sum_y) / t_ss, np.nan)
+
+    return slope
+
+def get_doubling_times(rates):
+    """
+    Days to double at daily growth `rates`,
+    NaN where cases don't grow.
+    """
+
+    rates = np.asarray(rates, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(rates > 0, np.log(2) / rates, np.nan)
+
+def get_latest_growth(matrices, metric='Confirmed'):
+    """
+
+    Growth rate and doubling time of `metric` at the last date,
+    one row per country, continent and the world.
+
+    Inputs
+    ------
+    matrices : dict
+        Window length -> (countries, regions) growth rate matrices.
+
+    """
+
+    cases, rollups = next(iter(matrices.values()))
+
+    df = pd.DataFrame({'Country': cases.countries + rollups.countries,
+                       'Level': (['Country'] * len(cases.countries)
+                                 + ['World' if r == WORLD else 'Continent' for r in rollups.countries])})
+
+    for window, (cases, rollups) in matrices.items():
+        rates = np.concatenate([cases.metric(metric)[-1], rollups.metric(metric)[-1]])
+        df[f'Growth rate {window}d'] = rates
+        df[f'Doubling time {window}d'] = get_doubling_times(rates)
+
+    return df
+
+def make_growth_rates(in_path, out_path, backend=DEFAULT_BACKEND, windows=GROWTH_WINDOWS, full=False):
+
+    matrices = dict()
+
+    for name in ['cases', 'rollups']:
+        source = CasesMatrix(path=in_path, name=name)
+
+        with step(f'hash {name}'):
+            hashes = hash_dates(source.values)
+
+        for window in windows:
+            with step(f'growth rate {name} {window}d'):
+                matrix = update_matrix(path=out_path,
+                                       name=f'{name}_growth_{window}d',
+                                       cases=source,
+                                       compute=lambda start: rolling_log_slope(source.values,
+                                                                               window=window,
+                                                                               start=start),
+                                       dtype=np.float64,
+                                       full=full,
+                                       source_hashes=hashes)
+
+            matrices.setdefault(window, list()).append(matrix)
+
+    df = get_latest_growth(matrices=matrices)
+
+    get_store(out_path, backend).write(df, 'doubling_times')
+
+
+if __name__ == '__main__':
+
+    in_path = './data/processed'
+    out_path = './data/processed'
+
+    make_growth_rates(in_path=in_path,
+                      out_path=out_path)
@@ -1,45 +1,53 @@
-from functools import reduce
-
 import numpy as np
 import pandas as pd
 
-from utils import get_country_ts, read_data
+from instrument import step
+from storage import DEFAULT_BACKEND, get_store
+from utils import read_data
 
-def get_mortality_data(country, confirmed, dead):
-    """    
+def get_mortality(confirmed, dead, mask_cells=False):
+    """
     Calculate mortality rate over time
-    for specific country.    
+    for all countries at once.
+
+    Only dates with confirmed cases in every
+    country are kept, unless `mask_cells` is set,
+    then all dates are kept with NaN where there
+    are no confirmed cases.
     """
-    
-    df = get_country_ts(country=country, 
-                        dataframes=[confirmed, dead], 
-                        columns=['Confirmed', 'Deaths'])
 
-    df = df[df['Confirmed'] > 0]
-    df['Mortality'] = df['Deaths'] / df['Confirmed']
-    df['Mortality'] = df['Mortality'] * 100
-    df['Mortality'] = np.round(df['Mortality'], 2)
-    df = df[['Date', 'Mortality']]
-    df.columns = ['Date', country]
-    
-    return df
+    countries = sorted(confirmed.drop('Date', axis=1).columns)
+
+    # Align deaths with dates of confirmed cases
+    dead = dead.set_index('Date').reindex(confirmed['Date'])
+    dead = dead.fillna(method='bfill')
+
+    conf = confirmed[countries].to_numpy(dtype=np.float64)
+    dead = dead[countries].to_numpy(dtype=np.float64)
+
+    if mask_cells:
+        mask = np.ones(len(conf), dtype=bool)
+        conf = np.where(conf > 0, conf, np.nan)
+    else:
+        mask = (conf > 0).all(axis=1)
+        conf = conf[mask]
+        dead = dead[mask]
+
+    mort = np.round(dead / conf * 100, 2)
+
+    mort = pd.DataFrame(mort, columns=countries)
+    mort.insert(0, 'Date', confirmed['Date'].to_numpy()[mask])
 
-def make_mortality(in_path, out_path):
+    return mort
 
-    conf,_,dead = read_data(in_path)
+def make_mortality(in_path, out_path, backend=DEFAULT_BACKEND):
 
-    all_countries = sorted(set(conf.drop('Date', axis=1).columns))
+    conf,_,dead = read_data(in_path, backend)
 
-    mort = list()
-    for c in all_countries:
-        tmp = get_mortality_data(country=c, 
-                                confirmed=conf, 
-                                dead=dead)
-        mort.append(tmp)
-        
-    mort = reduce(lambda x, y: pd.merge(x, y, on='Date'), mort)    
+    with step('mortality'):
+        mort = get_mortality(confirmed=conf, dead=dead)
 
-    mort.to_csv(f'{out_path}/mortality_rate.csv', index=False)
+    get_store(out_path, backend).write(mort, 'mortality_rate')
 
 if __name__ == '__main__':
 
@@ -47,4 +55,4 @@ if __name__ == '__main__':
     out_path = './data/processed'
 
     make_mortality(in_path=in_path,
-                   out_path=out_path)    
+                   out_path=out_path)
@@ -0,0 +1,104 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from cases_matrix import CasesMatrix, hash_dates, read_previous
+from instrument import step
+from storage import DEFAULT_BACKEND, get_store
+
+WORLD = 'World'
+
+def read_data(path, backend=DEFAULT_BACKEND):
+
+    store = get_store(path, backend)
+
+    continents = store.read('continents')
+    coordinates = store.read('coordinates')
+
+    return (continents, coordinates)
+
+def get_membership(countries, continents, coordinates):
+    """
+    Build matrix of shape (region, country) with ones
+    for countries in each continent and the world.
+    """
+
+    cont = pd.merge(coordinates, continents, on='Country')
+    cont = cont.drop_duplicates(subset=['Country'])
+
+    regions = sorted(set(cont['Continent'])) + [WORLD]
+    region_pos = {r: i for i, r in enumerate(regions)}
+    country_pos = {c: i for i, c in enumerate(countries)}
+
+    cont = cont[cont['Country'].isin(country_pos)]
+
+    membership = np.zeros((len(regions), len(countries)), dtype=np.int64)
+    membership[cont['Continent'].map(region_pos), cont['Country'].map(country_pos)] = 1
+    membership[region_pos[WORLD]] = 1
+
+    return regions, membership
+
+def get_rollups(values, membership):
+    """
+    Sum case time series over regions.
+
+    Inputs
+    ------
+    values : np.ndarray
+        Cases of shape (metric, date, country).
+    membership : np.ndarray
+        Region membership of shape (region, country).
+
+    Returns
+    -------
+    np.ndarray of shape (metric, date, region).
+    """
+
+    return values @ membership.T.astype(values.dtype)
+
+def make_rollups(in_path, out_path, backend=DEFAULT_BACKEND, name='rollups', full=False):
+
+    cases = CasesMatrix(path=in_path)
+    continents, coordinates = read_data(path=in_path, backend=backend)
+
+    regions, membership = get_membership(countries=cases.countries,
+                                         continents=continents,
+                                         coordinates=coordinates)
+
+    # Rollups of a date change with cases on that date
+    # and with countries in each region
+    key = hashlib.blake2b(membership.tobytes() + '\n'.join(cases.countries).encode(), digest_size=8)
+    hashes = [h + key.hexdigest() for h in hash_dates(cases.values)]
+
+    previous = None if full else read_previous(path=out_path,
+                                               name=name,
+                                               dates=cases.dates,
+                                               countries=regions,
+                                               metrics=cases.metrics,
+                                               source_hashes=hashes)
+    n_known = 0 if previous is None else previous.shape[1]
+
+    rollups = CasesMatrix.create(path=out_path,
+                                 dates=cases.dates,
+                                 countries=regions,
+                                 metrics=cases.metrics,
+                                 name=name,
+                                 dtype=cases.values.dtype,
+                                 source_hashes=hashes)
+
+    if n_known:
+        rollups.values[:, :n_known] = previous
+
+    with step('rollups'):
+        rollups.values[:, n_known:] = get_rollups(values=cases.values[:, n_known:],
+                                                  membership=membership)
+        rollups.commit()
+
+if __name__ == '__main__':
+
+    in_path = './data/processed'
+    out_path = './data/processed'
+
+    make_rollups(in_path=in_path,
+                 out_path=out_path)
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+from cases_matrix import CasesMatrix
+import make_cases
+from instrument import step
+from make_cases import CHUNK_SIZE
+from make_cases_daily_change import get_daily_changes
+from make_cases_since_t0 import get_cases_since_t0
+from make_mortality import get_mortality
+from storage import DEFAULT_BACKEND, get_store
+
+REGION_DTYPES = {'UID': np.int64, 'FIPS': np.float64, 'Admin2': str,
+                 'Province_State': str, 'Country_Region': str}
+
+REGION_COLUMNS = list(REGION_DTYPES)
+
+US_METRICS = ['Confirmed', 'Dead']
+
+def read_chunks(file_name, chunksize=CHUNK_SIZE):
+    """
+    Read county level time series, `chunksize` rows at a time.
+    """
+
+    return make_cases.read_chunks(file_name, chunksize=chunksize, keys=REGION_DTYPES, value_dtype=np.int32)
+
+def read_data(path, chunksize=CHUNK_SIZE):
+    """
+    Read US data from ../data/COVID-19
+    """
+
+    conf = read_chunks(f'{path}/time_series_covid19_confirmed_US.csv', chunksize=chunksize)
+    dead = read_chunks(f'{path}/time_series_covid19_deaths_US.csv', chunksize=chunksize)
+
+    return (conf, dead)
+
+def get_region_values(chunks):
+    """
+    Collect chunks into a region table and an int32
+    array of shape (region, date), sorted by UID.
+    """
+
+    regions = list()
+    values = list()
+
+    for chunk in chunks:
+        regions.append(chunk[REGION_COLUMNS])
+        values.append(chunk.drop(REGION_COLUMNS, axis=1).to_numpy(dtype=np.int32))
+
+    dates = pd.to_datetime(chunk.drop(REGION_COLUMNS, axis=1).columns, format='%m/%d/%y')
+
+    regions = pd.concat(regions, ignore_index=True)
+    values = np.concatenate(values)
+
+    order = np.argsort(regions['UID'].to_numpy(), kind='stable')
+    regions = regions.iloc[order].reset_index(drop=True)
+
+    return regions, dates, values[order]
+
+def align_regions(regions, other_regions, other_values):
+    """
+    Reorder values of another metric to match `regions`,
+    missing regions are filled with zeros.
+    """
+
+    pos = pd.Index(other_regions['UID']).get_indexer(regions['UID'])
+
+    aligned = np.zeros((len(regions), other_values.shape[1]), dtype=other_values.dtype)
+    aligned[pos >= 0] = other_values[pos[pos >= 0]]
+
+    return aligned
+
+def get_long(dates, values):
+    """
+    Convert (region, date) arrays to rows of (Date, Region, metrics...),
+    with Region as int32 codes, ie rows of the region table.
+    """
+
+    n_regions, n_dates = next(iter(values.values())).shape
+
+    df = pd.DataFrame({'Date': np.tile(dates, n_regions),
+                       'Region': np.repeat(np.arange(n_regions, dtype=np.int32), n_dates)})
+
+    for metric, v in values.items():
+        df[metric] = v.ravel()
+
+    return df
+
+def get_state_rollups(regions, values):
+    """
+    Sum regions by state and for the whole country.
+
+    Returns list of state names followed by `US`
+    and array of shape (metric, date, state).
+    """
+
+    codes, states = pd.factorize(regions['Province_State'].fillna('Unassigned'), sort=True)
+
+    # Sort by state once, then sum blocks of rows
+    order = np.argsort(codes, kind='stable')
+    starts = np.searchsorted(codes[order], np.arange(len(states)))
+
+    rollups = list()
+    for v in values.values():
+        v = v[order].astype(np.int64)
+        by_state = np.add.reduceat(v, starts, axis=0)
+        total = v.sum(axis=0, keepdims=True)
+        rollups.append(np.concatenate([by_state, total]).T)
+
+    return list(states) + ['US'], np.stack(rollups)
+
+def make_us_cases(in_path, out_path, backend=DEFAULT_BACKEND):
+
+    conf, dead = read_data(path=in_path)
+
+    with step('collect regions'):
+        regions, dates, conf = get_region_values(chunks=conf)
+        dead_regions, _, dead = get_region_values(chunks=dead)
+        dead = align_regions(regions=regions, other_regions=dead_regions, other_values=dead)
+
+    values = dict(zip(US_METRICS, [conf, dead]))
+
+    store = get_store(out_path, backend)
+    store.write(regions, 'us_regions')
+    store.write(get_long(dates=dates, values=values), 'us_cases')
+
+    # County level series, columns are UIDs of rows of `us_regions`
+    counties = CasesMatrix.create(path=out_path,
+                                  dates=dates,
+                                  countries=regions['UID'].astype(str).to_list(),
+                                  metrics=US_METRICS,
+                                  name='us_counties',
+                                  dtype=conf.dtype)
+    counties.values[:] = np.stack([v.T for v in values.values()])
+    counties.commit()
+
+    with step('state rollups'):
+        states, rollups = get_state_rollups(regions=regions, values=values)
+
+    matrix = CasesMatrix.create(path=out_path,
+                                dates=dates,
+                                countries=states,
+                                metrics=US_METRICS,
+                                name='us_rollups')
+    matrix.values[:] = rollups
+    matrix.commit()
+
+    # Same features as for countries, by state
+    conf = matrix.to_frame('Confirmed')
+    dead = matrix.to_frame('Dead')
+
+    store.write(conf, 'us_state_confirmed_cases')
+    store.write(dead, 'us_state_dead_cases')
+    store.write(get_daily_changes(df=conf), 'us_state_confirmed_cases_daily_change')
+    store.write(get_cases_since_t0(df=conf), 'us_state_confirmed_cases_since_t0')
+    # States and territories report from different dates, so
+    # mortality is masked per state rather than per date
+    store.write(get_mortality(confirmed=conf, dead=dead, mask_cells=True), 'us_state_mortality_rate')
+
+if __name__ == '__main__':
+
+    in_path = './data/raw/COVID-19/csse_covid_19_data/csse_covid_19_time_series'
+    out_path = './data/processed'
+
+    make_us_cases(in_path=in_path,
+                  out_path=out_path)
@@ -1,79 +1,134 @@
-from functools import reduce
-
+import numpy as np
 import pandas as pd
 
-from utils import remove_boats, rename_countries
+from countries import CountryRegistry
+from instrument import count_file, step
+from storage import DEFAULT_BACKEND, get_store
+
+# World Bank indicator code -> column in processed data
+INDICATORS = {'SP.DYN.LE00.IN': 'Life expectancy',
+              'NY.GDP.PCAP.PP.CD': 'GDP per capita',
+              'SP.URB.TOTL.IN.ZS': 'Urban population %',
+              'SP.RUR.TOTL.ZS': 'Rural population %',
+              'EN.POP.SLUM.UR.ZS': 'Slum population %',
+              'SP.POP.TOTL': 'Population',
+              'SH.XPD.CHEX.GD.ZS': 'GDP Healthcare %'}
+
+# Missing values are filled with the median of these columns
+MEDIAN_FILLED = ['Life expectancy', 'GDP Healthcare %', 'GDP per capita']
 
-def read_data(path):
+def read_data(path, registry, indicators=INDICATORS):
     """
-    Read data from the World Bank.
+    Read data from the World Bank into one long table of
+    (Country Code, Indicator, Year, Value) rows.
+
+    Country names are replaced with 3 letter codes
+    right away, rows without a code or value are dropped.
     """
 
-    files = [('SP.DYN.LE00.IN', 'Life expectancy'),
-             ('NY.GDP.PCAP.PP.CD', 'GDP per capita'),             
-             ('SP.URB.TOTL.IN.ZS', 'Urban population %'),
-             ('SP.RUR.TOTL.ZS', 'Rural population %'), 
-             ('EN.POP.SLUM.UR.ZS', 'Slum population %'),
-             ('SP.POP.TOTL', 'Population'),
-             ('SH.XPD.CHEX.GD.ZS', 'GDP Healthcare %')]
+    names, years, values, lengths = [], [], [], []
+
+    for indicator in indicators:
+        file_name = f'{path}/{indicator}.csv'
+        df = pd.read_csv(file_name, usecols=[0, 1, 2])
+        count_file(file_name)
+
+        names.append(df.iloc[:, 0].to_numpy())
+        years.append(pd.to_numeric(df.iloc[:, 1], errors='coerce').to_numpy())
+        values.append(df.iloc[:, 2].to_numpy(dtype=np.float64))
+        lengths.append(len(df))
 
-    dataframes = []
+    df = pd.DataFrame({'Country Code': registry.iso3(np.concatenate(names)),
+                       'Indicator': pd.Categorical.from_codes(np.repeat(np.arange(len(indicators)), lengths),
+                                                              categories=list(indicators.values())),
+                       'Year': np.concatenate(years),
+                       'Value': np.concatenate(values)})
 
-    for f,desc in files:
-        df = pd.read_csv(f'{path}/{f}.csv')
-        df = df.rename(columns={df.columns[2]: desc})
-        dataframes.append(df)
+    df = df.dropna().reset_index(drop=True)
+    df['Year'] = df['Year'].astype(np.int64)
 
-    return dataframes
+    return df
 
-def read_codes(path):
+def read_codes(path, backend=DEFAULT_BACKEND):
 
-    covid_codes = pd.read_csv(f'{path}/continents.csv')
+    covid_codes = get_store(path, backend).read('continents')
 
     wb_codes = pd.read_csv(f'{path}/world_bank_codes.csv')
+    count_file(f'{path}/world_bank_codes.csv')
 
     return covid_codes, wb_codes
 
-def read_stats(path):
+def read_stats(path, backend=DEFAULT_BACKEND):
 
-    stats = pd.read_csv(f'{path}/country_stats.csv')    
+    stats = get_store(path, backend).read('country_stats')
 
     return stats 
 
+def get_registry(covid_codes, wb_codes):
+    """
+    Look up 3 letter codes of country names used
+    in COVID-19 and World Bank data.
+    """
+
+    registry = CountryRegistry()
+    registry.add_codes(names=covid_codes['Country'], codes=covid_codes['Country Code'])
+    registry.add_codes(names=wb_codes['Country Name'], codes=wb_codes['Country Code'])
+
+    return registry
+
+def get_latest(df):
+    """
+    Get latest value of each indicator by country.
+
+    Rows are sorted by (country, indicator, year) once
+    and the last row of each group is taken.
+    """
+
+    country = df['Country Code'].cat.codes.to_numpy()
+    indicator = df['Indicator'].cat.codes.to_numpy()
+
+    order = np.lexsort((df['Year'].to_numpy(), indicator, country))
+    country, indicator = country[order], indicator[order]
+
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = (country[1:] != country[:-1]) | (indicator[1:] != indicator[:-1])
+
+    return df.iloc[order[last]].reset_index(drop=True)
+
 def get_world_bank_data(df):
     """
-    Get World Bank data into usable format.
+    Get World Bank data into usable format, one
+    row per country and column per indicator.
     """
-    
-    df = df.rename(columns={'country': 'Country', 'date': 'Date'})
-    df = df.dropna()
 
-    latest = df.groupby(['Country'])
-    latest = latest['Date'].max().to_frame()
-    latest = latest.reset_index()
+    latest = get_latest(df=df)
+
+    df = latest.pivot(index='Country Code', columns='Indicator', values='Value')
+    df = df.reindex(columns=latest['Indicator'].cat.categories)
+    df.columns = df.columns.astype(str)
+    df = df.reset_index()
+    df['Country Code'] = df['Country Code'].astype(str)
 
-    cols = ['Country', 'Date']
-    df = pd.merge(latest, df, left_on=cols, right_on=cols)
-    df = df.drop('Date', axis=1)
+    return df
 
-    return df 
+def make_world_bank(in_path, out_path, backend=DEFAULT_BACKEND):
 
-def make_world_bank(in_path, out_path):
+    covid_codes, wb_codes = read_codes(path=out_path, backend=backend)
 
-    covid_codes, wb_codes = read_codes(path=out_path)
+    stats = read_stats(path=out_path, backend=backend)
 
-    stats = read_stats(path=out_path)
+    registry = get_registry(covid_codes=covid_codes, wb_codes=wb_codes)
 
-    dataframes = read_data(path=in_path)
+    with step('read indicators'):
+        indicators = read_data(path=in_path, registry=registry)
 
-    for i in range(len(dataframes)):
-        dataframes[i] = get_world_bank_data(df=dataframes[i])
+    store = get_store(out_path, backend)
 
-    outer_join = lambda x, y: pd.merge(x, y, on='Country', how='outer')
+    # All years, for joins over time
+    store.write(indicators.astype({'Country Code': str, 'Indicator': str}), 'world_bank_indicators')
 
-    # Merge data from World Bank into one datast
-    world_bank = reduce(outer_join, dataframes)
-    world_bank = pd.merge(world_bank, wb_codes, left_on=['Country'], right_on=['Country Name'])
+    with step('latest values'):
+        world_bank = get_world_bank_data(df=indicators)
 
     # Get data about covid ready to join.
     countries = pd.merge(covid_codes, stats, on='Country')
@@ -83,21 +138,15 @@ def make_world_bank(in_path, out_path):
     world_bank = pd.merge(countries, world_bank, on='Country Code')
 
     # Use countries from original covid data.
-    world_bank = world_bank.drop(['Country_y', 'Country Name', 'Country Code'], axis=1)
-    world_bank = world_bank.rename(columns={'Country_x': 'Country', 'Mortality': 'Mortality %'})
+    world_bank = world_bank.drop(['Country Code'], axis=1)
+    world_bank = world_bank.rename(columns={'Mortality': 'Mortality %'})
 
     world_bank = world_bank[world_bank['Confirmed'] > 5000]
 
     world_bank = world_bank[world_bank['Country'] != 'Yemen']
 
-    median = world_bank['Life expectancy'].median()
-    world_bank['Life expectancy'] = world_bank['Life expectancy'].fillna(median)
-
-    median = world_bank['GDP Healthcare %'].median()
-    world_bank['GDP Healthcare %'] = world_bank['GDP Healthcare %'].fillna(median)
-
-    median = world_bank['GDP per capita'].median()
-    world_bank['GDP per capita'] = world_bank['GDP per capita'].fillna(median)
+    medians = world_bank[MEDIAN_FILLED].median()
+    world_bank[MEDIAN_FILLED] = world_bank[MEDIAN_FILLED].fillna(medians)
 
     world_bank['Cases per mln'] = world_bank['Confirmed'] / world_bank['Population'] / 10 ** 6
     world_bank['Dead per mln'] = world_bank['Dead'] / world_bank['Population'] / 10 ** 6
@@ -114,7 +163,7 @@ def make_world_bank(in_path, out_path):
 
     print(world_bank.head())
 
-    world_bank.to_csv(f'{out_path}/world_bank.csv', index=False)
+    store.write(world_bank, 'world_bank')
 
 if __name__ == '__main__':
 
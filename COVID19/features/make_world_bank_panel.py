@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+from cases_matrix import CasesMatrix
+from instrument import step
+from storage import DEFAULT_BACKEND, get_store
+
+def read_data(path, backend=DEFAULT_BACKEND):
+
+    store = get_store(path, backend)
+
+    indicators = store.read('world_bank_indicators')
+    continents = store.read('continents')
+
+    return indicators, continents
+
+def get_panel(cases, codes):
+    """
+    Rows of (Date, Country, Country Code, metrics...)
+    for every date and country of the cases matrix,
+    sorted by date. The first code of a country is used.
+    """
+
+    n_dates, n_countries = len(cases.dates), len(cases.countries)
+
+    codes = codes[~codes.index.duplicated()]
+    countries = pd.Index(cases.countries)
+    country_codes = codes.reindex(countries).to_numpy(dtype=object)
+
+    panel = pd.DataFrame({'Date': np.repeat(cases.dates, n_countries),
+                          'Country': np.tile(countries, n_dates),
+                          'Country Code': np.tile(country_codes, n_dates)})
+
+    for metric in cases.metrics:
+        panel[metric] = cases.metric(metric).ravel()
+
+    return panel
+
+def get_indicators_asof(panel, indicators, lag=pd.Timedelta(0)):
+    """
+    Attach to each (country, date) row of `panel` the latest
+    value of each indicator known at that date.
+
+    A value for year Y is taken as known `lag` after the end
+    of Y, December 31st by default, never before the year ends.
+    Indicators are pivoted to one row per country and year and
+    filled forward within each country, so a single `merge_asof`
+    over the whole panel, sorted by date, joins all of them.
+    """
+
+    names = indicators['Indicator'].unique()
+
+    # Join on integer codes of countries, those without
+    # a code never match
+    codes = pd.Index(indicators['Country Code'].unique())
+
+    values = indicators.assign(Code=codes.get_indexer(indicators['Country Code']))
+    values = values.pivot_table(index=['Code', 'Year'], columns='Indicator', values='Value', aggfunc='last')
+    values = values.reindex(columns=names).groupby(level='Code').ffill()
+    values = values.reset_index()
+
+    values['Date'] = pd.to_datetime(values.pop('Year').astype(str), format='%Y') + pd.offsets.YearEnd(0) + lag
+    values = values.sort_values('Date', kind='stable')
+
+    keys = pd.DataFrame({'Date': panel['Date'].to_numpy(),
+                         'Code': codes.get_indexer(panel['Country Code'])})
+
+    joined = pd.merge_asof(keys, values, on='Date', by='Code', direction='backward')
+
+    panel = panel.copy()
+
+    for name in names:
+        panel[name] = joined[name].to_numpy()
+
+    return panel
+
+def make_world_bank_panel(in_path, out_path, backend=DEFAULT_BACKEND):
+
+    cases = CasesMatrix(path=in_path)
+    indicators, continents = read_data(path=in_path, backend=backend)
+
+    codes = continents.set_index('Country')['Country Code']
+
+    with step('panel'):
+        panel = get_panel(cases=cases, codes=codes)
+
+    with step('as-of join'):
+        panel = get_indicators_asof(panel=panel, indicators=indicators)
+
+    get_store(out_path, backend).write(panel, 'world_bank_panel')
+
+if __name__ == '__main__':
+
+    in_path = './data/processed'
+    out_path = './data/processed'
+
+    make_world_bank_panel(in_path=in_path,
+                          out_path=out_path)
@@ -0,0 +1,351 @@
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import instrument
+
+MANIFEST_NAME = '.pipeline_manifest.json'
+
+def fingerprint(path, block_size=2 ** 20):
+    """
+    Calculate sha256 of file contents.
+    """
+
+    sha = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+def get_source_files(func):
+    """
+    Source files of the module defining `func` and of modules
+    from the same directory it uses, directly or not.
+    """
+
+    root = os.path.dirname(os.path.abspath(inspect.getsourcefile(func)))
+
+    sources = set()
+    modules = [inspect.getmodule(func)]
+
+    while modules:
+        module = modules.pop()
+        path = os.path.abspath(getattr(module, '__file__', None) or '')
+
+        if os.path.dirname(path) != root or path in sources:
+            continue
+
+        sources.add(path)
+
+        for obj in vars(module).values():
+            dep = obj if inspect.ismodule(obj) else inspect.getmodule(obj)
+            if dep is not None:
+                modules.append(dep)
+
+    return sorted(sources)
+
+class Stage(object):
+    """
+
+    A single step of the feature pipeline.
+
+    Inputs
+    ------
+    func : callable
+        One of the `make_*` functions.
+    inputs : list of str
+        Files read by `func`.
+    outputs : list of str
+        Files written by `func`.
+    kwargs : dict
+        Arguments passed to `func`.
+
+    Notes
+    -----
+    Source files of `func` and of local modules it uses are
+    treated as implicit inputs, so editing a stage or a helper
+    it relies on invalidates its cached outputs.
+
+    """
+
+    def __init__(self, func, inputs, outputs, name=None, **kwargs):
+
+        self.func = func
+        self.name = name or func.__name__
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.kwargs = kwargs
+
+    @property
+    def dependencies(self):
+        """
+
+        All files the stage output depends on.
+
+        """
+
+        return self.inputs + get_source_files(self.func)
+
+    def run(self):
+
+        return self.func(**self.kwargs)
+
+def run_in_worker(stage, options=None):
+    """
+    Run a stage in a worker process. With instrumentation
+    `options` given returns the record of the stage.
+    """
+
+    if options is None:
+        stage.run()
+        return None
+
+    recorder = instrument.enable(**options)
+
+    try:
+        with recorder.stage(stage.name) as record:
+            stage.run()
+    finally:
+        instrument.disable()
+
+    return record
+
+class Pipeline(object):
+    """
+
+    Run stages in dependency order, skipping those whose inputs did not
+    change since the last successful run.
+
+    Input fingerprints are kept in a json manifest. Files are only
+    re-hashed when their size or modification time changed.
+
+    """
+
+    def __init__(self, stages, manifest_path):
+
+        self.stages = list(stages)
+        self.manifest_path = manifest_path
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = dict()
+
+        manifest.setdefault('files', dict())
+        manifest.setdefault('stages', dict())
+
+        return manifest
+
+    def _write_manifest(self):
+
+        tmp = f'{self.manifest_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def fingerprint(self, path):
+        """
+
+        Get content hash of a file, reusing the cached value when
+        size and modification time are unchanged.
+
+        """
+
+        stat = os.stat(path)
+        key = [stat.st_size, stat.st_mtime_ns]
+
+        cached = self.manifest['files'].get(path)
+        if cached is not None and cached['stat'] == key:
+            return cached['sha256']
+
+        sha = fingerprint(path)
+        self.manifest['files'][path] = {'stat': key, 'sha256': sha}
+
+        return sha
+
+    def is_fresh(self, stage, fingerprints):
+        """
+
+        Check if outputs of a stage exist and were built
+        from the same inputs.
+
+        """
+
+        if not all(os.path.exists(path) for path in stage.outputs):
+            return False
+
+        return self.manifest['stages'].get(stage.name) == fingerprints
+
+    def dependencies(self):
+        """
+
+        Infer which stages have to finish before each stage can run,
+        ie stages writing one of its inputs.
+
+        """
+
+        producers = {path: stage.name for stage in self.stages for path in stage.outputs}
+
+        graph = dict()
+        for stage in self.stages:
+            graph[stage.name] = {producers[path] for path in stage.inputs
+                                 if path in producers and producers[path] != stage.name}
+
+        return graph
+
+    def ordered(self):
+        """
+
+        Sort stages so that each stage comes after its dependencies.
+
+        """
+
+        graph = self.dependencies()
+        stages = {stage.name: stage for stage in self.stages}
+
+        ordered = list()
+        done = set()
+        while len(ordered) < len(stages):
+            ready = [name for name, deps in graph.items() if name not in done and deps <= done]
+
+            if not ready:
+                raise ValueError(f'Circular dependency between stages: {sorted(set(graph) - done)}')
+
+            # Keep declaration order between independent stages
+            ordered += [stages[name] for name in ready]
+            done.update(ready)
+
+        return ordered
+
+    def check(self, stage, force=False):
+        """
+
+        Get input fingerprints of a stage that has to be run,
+        None if its outputs are up to date.
+
+        """
+
+        fingerprints = {path: self.fingerprint(path) for path in stage.dependencies}
+
+        if not force and self.is_fresh(stage, fingerprints):
+            print(f'Skipping {stage.name}, inputs unchanged.')
+            return None
+
+        return fingerprints
+
+    def record(self, stage, fingerprints):
+        """
+
+        Save fingerprints of a successfully finished stage.
+
+        """
+
+        self.manifest['stages'][stage.name] = fingerprints
+        self._write_manifest()
+
+    def run_stage(self, stage, force=False):
+        """
+
+        Run a stage if required. Returns True if the stage was run.
+
+        """
+
+        fingerprints = self.check(stage, force=force)
+
+        if fingerprints is None:
+            return False
+
+        print(f'Running {stage.name}.')
+        with instrument.stage(stage.name):
+            stage.run()
+        self.record(stage, fingerprints)
+
+        return True
+
+    def run(self, force=False, jobs=1):
+        """
+
+        Run all stages, returns names of stages that were run.
+
+        With `jobs` > 1 independent stages are run at the same
+        time in a pool of worker processes.
+
+        """
+
+        if jobs < 1:
+            raise ValueError(f'jobs must be at least 1, got {jobs}')
+
+        stages = self.ordered()
+
+        if jobs == 1:
+            return [stage.name for stage in stages if self.run_stage(stage, force=force)]
+
+        return self._run_parallel(stages=stages, force=force, jobs=jobs)
+
+    def _run_parallel(self, stages, force, jobs):
+
+        graph = self.dependencies()
+        pending = {stage.name: graph[stage.name] for stage in stages}
+        stages = {stage.name: stage for stage in stages}
+
+        ran = list()
+        running = dict()
+
+        recorder = instrument.get_recorder()
+        options = None if recorder is None else recorder.options
+
+        def finish(name):
+            for deps in pending.values():
+                deps.discard(name)
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+
+            while pending or running:
+
+                ready = [name for name, deps in pending.items() if not deps]
+
+                if ready:
+                    for name in ready:
+                        del pending[name]
+                        stage = stages[name]
+
+                        # Inputs are final once all dependencies finished
+                        fingerprints = self.check(stage, force=force)
+
+                        if fingerprints is None:
+                            finish(name)
+                        else:
+                            print(f'Running {stage.name}.')
+                            running[executor.submit(run_in_worker, stage, options)] = (stage, fingerprints)
+
+                    # Skipped stages may unblock others
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    stage, fingerprints = running.pop(future)
+
+                    try:
+                        record = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+
+                    if recorder is not None:
+                        recorder.add_stage(record)
+
+                    self.record(stage, fingerprints)
+                    ran.append(stage.name)
+                    finish(stage.name)
+
+        return ran
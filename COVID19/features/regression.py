@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+FIT_COLUMNS = ['n', 'slope', 'intercept', 'r', 'r2', 'p_value', 'stderr']
+
+def get_groups(df, by=None):
+    """
+    Order of rows sorting them by group, start of each
+    group in that order and group labels.
+    """
+
+    if by is None:
+        return np.arange(len(df)), np.array([0]), [None]
+
+    codes, labels = pd.factorize(df[by], sort=True)
+
+    # Rows without a group are left out
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    starts = np.searchsorted(codes[order], np.arange(len(labels)))
+
+    return order, starts, list(labels)
+
+def fit_pairs(df, x=None, y=None, by=None):
+    """
+
+    Fit y = slope * x + intercept for every pair of columns
+    in `x` and `y`, in every group of rows by column `by`.
+
+    Inputs
+    ------
+    df : pd.DataFrame
+        Data, missing values are left out pairwise.
+    x, y : list of str
+        Columns of explanatory and dependent variables,
+        all numeric columns by default.
+    by : str
+        Column to group rows by, eg. `Continent` or `Date`.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per group and pair of different columns
+        with number of observations, slope, intercept,
+        correlation, R squared, two-sided p-value of
+        zero slope and standard error of the slope, as
+        given by `scipy.stats.linregress`.
+
+    Notes
+    -----
+    Sums of x, y, their squares and products are accumulated
+    for all groups at once with `np.add.reduceat`, then all
+    fits are computed with array operations.
+
+    """
+
+    numeric = df.select_dtypes('number').columns.drop(by, errors='ignore').to_list()
+    x = numeric if x is None else list(x)
+    y = numeric if y is None else list(y)
+
+    order, starts, labels = get_groups(df, by)
+
+    X = df[x].to_numpy(dtype=np.float64)[order]
+    Y = df[y].to_numpy(dtype=np.float64)[order]
+
+    # Centering keeps sums of squares small
+    X = X - np.nanmean(X, axis=0)
+    Y = Y - np.nanmean(Y, axis=0)
+    x_mean = np.nanmean(df[x].to_numpy(dtype=np.float64), axis=0)
+    y_mean = np.nanmean(df[y].to_numpy(dtype=np.float64), axis=0)
+
+    Mx, My = ~np.isnan(X), ~np.isnan(Y)
+    X0, Y0 = np.where(Mx, X, 0.), np.where(My, Y, 0.)
+
+    sums = lambda v: np.add.reduceat(v, starts, axis=0) if len(v) else np.zeros((len(starts), v.shape[1]))
+
+    shape = (len(labels), len(x), len(y))
+    n, sx, sy, sxx, syy, sxy = [np.zeros(shape) for _ in range(6)]
+
+    for i in range(len(x)):
+        xi, mi = X0[:, i:i + 1], Mx[:, i:i + 1]
+
+        n[:, i] = sums(mi * My)
+        sx[:, i] = sums(xi * My)
+        sy[:, i] = sums(mi * Y0)
+        sxx[:, i] = sums(xi * xi * My)
+        syy[:, i] = sums(mi * Y0 * Y0)
+        sxy[:, i] = sums(xi * Y0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+
+        slope = cov / var_x
+        intercept = (sy - slope * sx) / n + y_mean - slope * x_mean[:, None]
+
+        r = np.clip(cov / np.sqrt(var_x * var_y), -1, 1)
+        r2 = r * r
+
+        dof = n - 2
+        t = r * np.sqrt(dof / ((1 - r) * (1 + r)))
+        p_value = np.where(dof > 0, 2 * t_dist.sf(np.abs(t), np.maximum(dof, 1)), np.nan)
+        stderr = np.sqrt((1 - r2) * var_y / var_x / dof)
+
+    fits = pd.DataFrame({'x': np.tile(np.repeat(x, len(y)), len(labels)),
+                         'y': np.tile(y, len(labels) * len(x))})
+
+    if by is not None:
+        fits.insert(0, by, np.repeat(np.array(labels, dtype=object), len(x) * len(y)))
+
+    for name, values in zip(FIT_COLUMNS, [n, slope, intercept, r, r2, p_value, stderr]):
+        fits[name] = values.ravel()
+
+    fits['n'] = fits['n'].astype(np.int64)
+    fits = fits[fits['x'] != fits['y']].reset_index(drop=True)
+
+    return fits
@@ -0,0 +1,157 @@
+import os
+
+import pandas as pd
+
+from instrument import count_file, step
+
+DEFAULT_BACKEND = 'parquet'
+
+class CSVStore(object):
+    """
+
+    Read and write processed datasets as csv files.
+
+    Inputs
+    ------
+    path : str
+        Directory with processed data.
+
+    Notes
+    -----
+    Datasets are referred to by name, without extension,
+    eg. `confirmed_cases`. A `Date` column is always returned
+    as datetime.
+
+    """
+
+    extension = 'csv'
+
+    def __init__(self, path):
+
+        self.path = path
+
+    def file_name(self, name):
+
+        return f'{self.path}/{name}.{self.extension}'
+
+    def exists(self, name):
+
+        return os.path.exists(self.file_name(name))
+
+    def names(self):
+        """
+
+        List datasets available in the store.
+
+        """
+
+        suffix = f'.{self.extension}'
+
+        return sorted(f[:-len(suffix)] for f in os.listdir(self.path) if f.endswith(suffix))
+
+    def read(self, name):
+
+        file_name = self.file_name(name)
+
+        with step(f'read {name}'):
+            df = self._read(file_name)
+            count_file(file_name, key='bytes_read', df=df)
+
+        return df
+
+    def write(self, df, name):
+
+        file_name = self.file_name(name)
+
+        with step(f'write {name}'):
+            self._write(df, file_name)
+            count_file(file_name, key='bytes_written', df=df)
+
+    def _read(self, file_name):
+
+        df = pd.read_csv(file_name)
+
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date'])
+
+        return df
+
+    def _write(self, df, file_name):
+
+        df.to_csv(file_name, index=False)
+
+class ParquetStore(CSVStore):
+    """
+
+    Read and write processed datasets as parquet files,
+    keeps dtypes between stages.
+
+    """
+
+    extension = 'parquet'
+
+    def _read(self, file_name):
+
+        return pd.read_parquet(file_name)
+
+    def _write(self, df, file_name):
+
+        df.to_parquet(file_name, index=False)
+
+class FeatherStore(CSVStore):
+    """
+
+    Read and write processed datasets as Arrow IPC (feather) files.
+
+    """
+
+    extension = 'feather'
+
+    def _read(self, file_name):
+
+        return pd.read_feather(file_name)
+
+    def _write(self, df, file_name):
+
+        df.reset_index(drop=True).to_feather(file_name)
+
+BACKENDS = {'csv': CSVStore,
+            'parquet': ParquetStore,
+            'feather': FeatherStore}
+
+def get_store(path, backend=DEFAULT_BACKEND):
+    """
+    Get store for processed data.
+
+    With `backend` set to None the backend is detected
+    from files already in `path`.
+    """
+
+    if backend is None:
+        backend = detect_backend(path=path)
+
+    return BACKENDS[backend](path)
+
+def detect_backend(path, name='confirmed_cases'):
+    """
+    Find backend used to write dataset `name`.
+    """
+
+    # Prefer binary formats if old csv files are left over
+    for backend in ['parquet', 'feather', 'csv']:
+        if BACKENDS[backend](path).exists(name):
+            return backend
+
+    return DEFAULT_BACKEND
+
+def export(src, dst, names=None):
+    """
+    Copy datasets between stores, eg. to csv for sharing.
+    """
+
+    names = src.names() if names is None else names
+
+    os.makedirs(dst.path, exist_ok=True)
+
+    for name in names:
+        dst.write(src.read(name), name)
@@ -1,16 +1,21 @@
 import pandas as pd
 from functools import reduce
 
+from countries import normalize_countries
+from storage import DEFAULT_BACKEND, get_store
+
 BOATS = ['Diamond Princess', 'MS Zaandam']
 
-def read_data(path):
+def read_data(path, backend=DEFAULT_BACKEND):
     """
     Read cleaned cases datasets.
     """
 
-    conf = pd.read_csv(f'{path}/confirmed_cases.csv')
-    recov = pd.read_csv(f'{path}/recovered_cases.csv')
-    dead = pd.read_csv(f'{path}/dead_cases.csv')
+    store = get_store(path, backend)
+
+    conf = store.read('confirmed_cases')
+    recov = store.read('recovered_cases')
+    dead = store.read('dead_cases')
 
     return (conf, recov, dead)
 
@@ -37,12 +42,7 @@ def rename_countries(df):
     Rename countries.
     """
 
-    df['Country'] = df['Country'].apply(lambda x: 'Taiwan' if x == 'Taiwan*' else x)
-    df['Country'] = df['Country'].apply(lambda x: 'Korea' if x == 'Korea, South' else x)
-    df['Country'] = df['Country'].apply(lambda x: 'Macedonia'  if x == 'North Macedonia' else x)
-    df['Country'] = df['Country'].apply(lambda x: 'Cape Verde' if x == 'Cabo Verde' else x)
-    df['Country'] = df['Country'].apply(lambda x: 'Congo' if x == 'Congo (Brazzaville)'  else x)
-    df['Country'] = df['Country'].apply(lambda x: 'Congo' if x == 'Congo (Kinshasa)' else x)
+    df['Country'] = normalize_countries(df['Country'])
     
     return df    
 
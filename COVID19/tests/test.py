@@ -1,14 +1,21 @@
-import pandas as pd
+import os
+import sys
 import unittest
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+
+from storage import get_store
+
 class TestCovidCases(unittest.TestCase):
 
     def setUp(self):
 
-        self.confirmed_cases = pd.read_csv('./data/processed/confirmed_cases.csv')
-        self.recovered_cases = pd.read_csv('./data/processed/recovered_cases.csv')
-        self.dead_cases = pd.read_csv('./data/processed/dead_cases.csv')
-        self.active_cases = pd.read_csv('./data/processed/active_cases.csv')                
+        store = get_store('./data/processed', backend=None)
+
+        self.confirmed_cases = store.read('confirmed_cases')
+        self.recovered_cases = store.read('recovered_cases')
+        self.dead_cases = store.read('dead_cases')
+        self.active_cases = store.read('active_cases')
 
     def test_confirmed_boats(self):
 
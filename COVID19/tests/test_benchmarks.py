@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from run_benchmarks import compare, parse_size
+
+def make_result(stage, wall_time, peak_rss_mb, size=(190, 100, 190)):
+
+    regions, days, countries = size
+
+    return dict(regions=regions, days=days, countries=countries, stage=stage,
+                wall_time=wall_time, cpu_time=wall_time, peak_rss_mb=peak_rss_mb)
+
+class TestCompare(unittest.TestCase):
+
+    def setUp(self):
+
+        self.baseline = [make_result('make_cases', 1., 100.),
+                         make_result('make_rollups', 0.01, 100.),
+                         make_result('make_cases', 1., 100., size=(190, 100, 50))]
+
+    def test_regressions(self):
+
+        results = [make_result('make_cases', 1.3, 130.),
+                   make_result('make_rollups', 0.04, 100.),
+                   make_result('make_mortality', 9., 900.)]
+
+        self.assertEqual(compare(results, self.baseline, tolerance=0.25),
+                         [(190, 100, 190, 'make_cases', 'wall_time', 1., 1.3),
+                          (190, 100, 190, 'make_cases', 'peak_rss_mb', 100., 130.)])
+
+    def test_within_tolerance(self):
+
+        results = [make_result('make_cases', 1.2, 120.),
+                   make_result('make_rollups', 0.01, 100.)]
+
+        self.assertEqual(compare(results, self.baseline, tolerance=0.25), [])
+
+    def test_sizes_compared_separately(self):
+
+        # Same regions and days, more countries than the baseline
+        results = [make_result('make_cases', 2., 200., size=(190, 100, 50)),
+                   make_result('make_cases', 2., 200., size=(190, 100, 5000))]
+
+        self.assertEqual([r[:5] for r in compare(results, self.baseline)],
+                         [(190, 100, 50, 'make_cases', 'wall_time'),
+                          (190, 100, 50, 'make_cases', 'peak_rss_mb')])
+
+    def test_parse_size(self):
+
+        self.assertEqual(parse_size('1000x500'), (1000, 500, 190))
+        self.assertEqual(parse_size('5000X500x5000'), (5000, 500, 5000))
+        self.assertEqual(parse_size('100x10x500'), (100, 10, 100))
+
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_size('1x2x3x4')
+
+if __name__ == '__main__':
+
+    unittest.main()
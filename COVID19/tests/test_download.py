@@ -0,0 +1,184 @@
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from git import Actor, Repo
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+
+from covid_repo import TIME_SERIES_PATH, update_repo
+from downloader import Downloader
+
+class Handler(BaseHTTPRequestHandler):
+    """
+
+    Serve `server.files` with ETag and range support.
+
+    """
+
+    def do_GET(self):
+
+        self.server.requests.append((self.path, dict(self.headers)))
+
+        content = self.server.files[self.path]
+        etag = '"' + hashlib.md5(content).hexdigest() + '"'
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        status = 200
+        if self.headers.get('Range') and self.headers.get('If-Range') == etag:
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            content = content[start:]
+            status = 206
+
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+
+        pass
+
+class TestDownloader(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.files = {'/a.csv': b'a,b\n1,2\n' * 1000,
+                             '/b.csv': b'c,d\n3,4\n' * 1000}
+        self.server.requests = list()
+
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+
+    def tearDown(self):
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def read(self, name):
+
+        with open(f'{self.path}/{name}', 'rb') as f:
+            return f.read()
+
+    def test_not_modified(self):
+
+        downloader = Downloader()
+        path = f'{self.path}/a.csv'
+
+        self.assertTrue(downloader.fetch(url=f'{self.url}/a.csv', path=path))
+        self.assertFalse(downloader.fetch(url=f'{self.url}/a.csv', path=path))
+        self.assertEqual(self.read('a.csv'), self.server.files['/a.csv'])
+
+        self.server.files['/a.csv'] = b'changed'
+
+        self.assertTrue(downloader.fetch(url=f'{self.url}/a.csv', path=path))
+        self.assertEqual(self.read('a.csv'), b'changed')
+
+    def test_resume(self):
+
+        downloader = Downloader()
+        path = f'{self.path}/a.csv'
+        content = self.server.files['/a.csv']
+
+        downloader.fetch(url=f'{self.url}/a.csv', path=path)
+        meta = downloader.read_meta(path)
+
+        # Simulate an interrupted download
+        os.remove(path)
+        with open(f'{path}.part', 'wb') as f:
+            f.write(content[:100])
+        meta['partial'] = True
+        downloader.write_meta(path, meta)
+
+        self.assertTrue(downloader.fetch(url=f'{self.url}/a.csv', path=path))
+        self.assertEqual(self.read('a.csv'), content)
+        self.assertEqual(self.server.requests[-1][1]['Range'], 'bytes=100-')
+
+    def test_fetch_all(self):
+
+        downloader = Downloader(max_workers=2, rate=100)
+        files = [(f'{self.url}/{name}', f'{self.path}/{name}') for name in ['a.csv', 'b.csv']]
+
+        self.assertEqual(list(downloader.fetch_all(files).values()), [True, True])
+        self.assertEqual(list(downloader.fetch_all(files).values()), [False, False])
+        self.assertEqual(self.read('b.csv'), self.server.files['/b.csv'])
+
+class TestUpdateRepo(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp = tempfile.TemporaryDirectory()
+        path = self.tmp.name
+
+        self.bare = f'{path}/upstream.git'
+        self.url = f'file://{self.bare}'
+        self.checkout = f'{path}/COVID-19'
+
+        Repo.init(self.bare, bare=True)
+        self.work = Repo.init(f'{path}/work')
+        self.work.create_remote('origin', self.bare)
+
+        self.commit({f'{TIME_SERIES_PATH}/confirmed.csv': '1',
+                     f'{TIME_SERIES_PATH}/deaths.csv': '0',
+                     'csse_covid_19_data/csse_covid_19_daily_reports/01-22-2020.csv': 'x'})
+
+    def tearDown(self):
+
+        self.tmp.cleanup()
+
+    def commit(self, files):
+
+        for name, content in files.items():
+            full_path = os.path.join(self.work.working_dir, name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w') as f:
+                f.write(content)
+
+        self.work.index.add(list(files))
+        actor = Actor('test', 'test@example.com')
+        self.work.index.commit('update', author=actor, committer=actor)
+        self.work.git.push('origin', 'HEAD:refs/heads/master')
+
+    def test_clone_is_sparse(self):
+
+        changed = update_repo(url=self.url, path=self.checkout)
+
+        self.assertEqual(sorted(changed), [f'{TIME_SERIES_PATH}/confirmed.csv',
+                                           f'{TIME_SERIES_PATH}/deaths.csv'])
+        self.assertTrue(os.path.exists(f'{self.checkout}/{TIME_SERIES_PATH}/confirmed.csv'))
+        self.assertFalse(os.path.exists(f'{self.checkout}/csse_covid_19_data/csse_covid_19_daily_reports'))
+
+    def test_update(self):
+
+        update_repo(url=self.url, path=self.checkout)
+
+        self.commit({f'{TIME_SERIES_PATH}/confirmed.csv': '2',
+                     'csse_covid_19_data/csse_covid_19_daily_reports/01-23-2020.csv': 'y'})
+
+        self.assertEqual(update_repo(url=self.url, path=self.checkout),
+                         [f'{TIME_SERIES_PATH}/confirmed.csv'])
+        self.assertEqual(update_repo(url=self.url, path=self.checkout), [])
+
+        with open(f'{self.checkout}/{TIME_SERIES_PATH}/confirmed.csv') as f:
+            self.assertEqual(f.read(), '2')
+
+        self.assertTrue(Repo(self.checkout).git.rev_parse('--is-shallow-repository') == 'true')
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,532 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from scipy.stats import linregress
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+
+from cases_matrix import REVISION_DAYS, CasesMatrix
+from countries import CountryRegistry
+from make_cases import process_data, read_chunks
+from make_cases import make_cases as run_make_cases
+from make_cases_daily_change import diff_matrix, rolling_mean, update_matrix
+from make_cases_since_t0 import get_cases_since_t0, get_cases_since_thresholds
+from make_country_stats import get_country_stats, get_snapshots
+from make_growth_rates import get_doubling_times, rolling_log_slope
+from make_mortality import get_mortality
+from make_rollups import WORLD, get_membership, get_rollups, make_rollups
+from make_us_cases import align_regions, get_long, get_region_values, get_state_rollups, make_us_cases
+from make_world_bank import get_world_bank_data
+from make_world_bank_panel import get_indicators_asof, get_panel
+from regression import fit_pairs
+from storage import BACKENDS, get_store
+
+def make_cases(values, countries=('A', 'B', 'C')):
+
+    df = pd.DataFrame(values, columns=list(countries))
+    df.insert(0, 'Date', pd.date_range('2020-01-22', periods=len(df)))
+
+    return df
+
+class TestCountryRegistry(unittest.TestCase):
+
+    def test_normalize(self):
+
+        registry = CountryRegistry()
+        names = registry.normalize(['Taiwan*', 'Poland', 'Congo (Kinshasa)', 'Congo (Brazzaville)', None])
+
+        self.assertEqual(list(names), ['Taiwan', 'Poland', 'Congo', 'Congo', np.nan])
+        self.assertEqual(list(names.categories), ['Congo', 'Poland', 'Taiwan'])
+
+    def test_iso3(self):
+
+        registry = CountryRegistry()
+        registry.add_codes(names=['Czech Republic', 'Poland'], codes=['CZE', 'POL'])
+
+        self.assertEqual(list(registry.iso3(['Czechia', 'Poland', 'Atlantis'])), ['CZE', 'POL', np.nan])
+
+class TestProcessData(unittest.TestCase):
+
+    def setUp(self):
+
+        self.raw = pd.DataFrame({'Province/State': [None, 'Hubei', None, None, None],
+                                 'Country/Region': ['Korea, South', 'China', 'China', 'Taiwan*', 'MS Zaandam'],
+                                 'Lat': [0.0, 1.0, 2.0, 3.0, 4.0],
+                                 'Long': [0.0, 1.0, 2.0, 3.0, 4.0],
+                                 '1/22/20': [1, 2, 3, 4, 5],
+                                 '1/23/20': [2, 4, 6, 8, 10]})
+
+    def test_process_data(self):
+
+        df = process_data(self.raw)
+
+        self.assertEqual(df.columns.to_list(), ['Date', 'China', 'Korea', 'Taiwan'])
+        self.assertEqual(df['Date'].to_list(), list(pd.date_range('2020-01-22', periods=2)))
+        np.testing.assert_array_equal(df[['China', 'Korea', 'Taiwan']].to_numpy(), [[5, 1, 4], [10, 2, 8]])
+
+    def test_chunks(self):
+
+        with tempfile.TemporaryDirectory() as path:
+            file_name = f'{path}/cases.csv'
+            self.raw.to_csv(file_name, index=False)
+
+            wide = process_data(read_chunks(file_name, chunksize=2))
+            long = process_data(read_chunks(file_name, chunksize=2), long=True)
+
+        pd.testing.assert_frame_equal(wide, process_data(self.raw))
+        self.assertEqual(long.set_index(['Date', 'Country'])['Cases'].sum(), 30)
+
+    def test_chunks_blank_cells(self):
+
+        with tempfile.TemporaryDirectory() as path:
+            file_name = f'{path}/cases.csv'
+            self.raw.to_csv(file_name, index=False)
+
+            # Blank the Hubei count of the second day
+            with open(file_name) as f:
+                lines = f.read().splitlines()
+            lines[2] = lines[2][:-2] + ','
+
+            with open(file_name, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+
+            df = process_data(read_chunks(file_name, chunksize=2))
+
+        self.assertEqual(df['China'].to_list(), [5, 6])
+        self.assertEqual(df['China'].dtype, np.int64)
+
+    def test_make_cases_align(self):
+
+        with tempfile.TemporaryDirectory() as path:
+            self.raw.to_csv(f'{path}/time_series_covid19_confirmed_global.csv', index=False)
+            self.raw.to_csv(f'{path}/time_series_covid19_deaths_global.csv', index=False)
+
+            # Recovered without Taiwan and the second day
+            self.raw.drop(3).drop('1/23/20', axis=1).to_csv(f'{path}/time_series_covid19_recovered_global.csv',
+                                                            index=False)
+
+            run_make_cases(in_path=path, out_path=path, backend='csv')
+
+            cases = CasesMatrix(path=path)
+
+            self.assertEqual(cases.countries, ['China', 'Korea', 'Taiwan'])
+            np.testing.assert_array_equal(cases.metric('Recovered'), [[5, 1, 0], [0, 0, 0]])
+            np.testing.assert_array_equal(cases.metric('Dead'), [[5, 1, 4], [10, 2, 8]])
+
+            del cases
+
+class TestUSCases(unittest.TestCase):
+
+    def setUp(self):
+
+        # Unsorted UIDs, Guam has a single region
+        self.raw = pd.DataFrame({'UID': [84001003, 316, 84001001, 84002001],
+                                 'FIPS': [1003., 66., 1001., 2001.],
+                                 'Admin2': ['Baldwin', None, 'Autauga', 'Aleutians'],
+                                 'Province_State': ['Alabama', 'Guam', 'Alabama', 'Alaska'],
+                                 'Country_Region': ['US', 'US', 'US', 'US'],
+                                 '1/22/20': [1, 0, 2, 0],
+                                 '1/23/20': [3, 1, 4, 5]})
+
+    def test_rollups(self):
+
+        regions, dates, values = get_region_values([self.raw.iloc[:2], self.raw.iloc[2:]])
+
+        self.assertEqual(regions['UID'].to_list(), [316, 84001001, 84001003, 84002001])
+        np.testing.assert_array_equal(values, [[0, 1], [2, 4], [1, 3], [0, 5]])
+
+        # Deaths of regions in another order, one region missing
+        dead = align_regions(regions=regions,
+                             other_regions=pd.DataFrame({'UID': [84002001, 316, 84001001]}),
+                             other_values=np.array([[0, 1], [0, 0], [1, 2]]))
+        np.testing.assert_array_equal(dead, [[0, 0], [1, 2], [0, 0], [0, 1]])
+
+        states, rollups = get_state_rollups(regions=regions, values={'Confirmed': values, 'Dead': dead})
+
+        self.assertEqual(states, ['Alabama', 'Alaska', 'Guam', 'US'])
+        np.testing.assert_array_equal(rollups[0], [[3, 0, 0, 3], [7, 5, 1, 13]])
+        np.testing.assert_array_equal(rollups[1], [[1, 0, 0, 1], [2, 1, 0, 3]])
+
+        long = get_long(dates=dates, values={'Confirmed': values})
+
+        self.assertEqual(len(long), 8)
+        self.assertEqual(long[long['Region'] == 1]['Confirmed'].to_list(), [2, 4])
+
+    def test_make_us_cases(self):
+
+        with tempfile.TemporaryDirectory() as path:
+            for metric in ['confirmed', 'deaths']:
+                self.raw.to_csv(f'{path}/time_series_covid19_{metric}_US.csv', index=False)
+
+            # Blank cell in deaths of Guam
+            raw = self.raw.astype({'1/22/20': float})
+            raw.loc[1, '1/22/20'] = np.nan
+            raw.to_csv(f'{path}/time_series_covid19_deaths_US.csv', index=False)
+
+            make_us_cases(in_path=path, out_path=path, backend='csv')
+
+            counties = CasesMatrix(path=path, name='us_counties')
+            np.testing.assert_array_equal(counties.country('84001003'), [[1, 3], [1, 3]])
+
+            mort = get_store(path, 'csv').read('us_state_mortality_rate')
+            np.testing.assert_array_equal(mort['Alaska'].to_numpy(), [np.nan, 100.0])
+
+            del counties
+
+class TestRollups(unittest.TestCase):
+
+    def setUp(self):
+
+        self.values = np.random.default_rng(0).integers(0, 100, (2, 30, 4)).cumsum(axis=1)
+        self.countries = ['Chile', 'Egypt', 'Peru', 'Poland']
+        self.continents = pd.DataFrame({'Country': ['Chile', 'Egypt', 'Peru', 'Poland', 'Atlantis'],
+                                        'Continent': ['South America', 'Africa', 'South America',
+                                                      'Europe', 'Europe']})
+        self.coordinates = pd.DataFrame({'Country': self.countries + ['Poland'],
+                                         'Lat': [0.] * 5,
+                                         'Long': [0.] * 5})
+
+    def expected(self, continents, n_dates=30):
+
+        expected = list()
+
+        for values in self.values[:, :n_dates]:
+            df = pd.DataFrame(values.T, index=self.countries)
+            sums = df.groupby(continents.set_index('Country')['Continent'].reindex(df.index)).sum()
+            sums.loc[WORLD] = df.sum()
+            expected.append(sums.to_numpy().T)
+
+        return list(sums.index), np.array(expected)
+
+    def write_cases(self, path, n_dates=30, revision=0):
+
+        cases = CasesMatrix.create(path=path, dates=pd.date_range('2020-01-22', periods=n_dates),
+                                   countries=self.countries, metrics=['Confirmed', 'Dead'])
+        cases.values[:] = self.values[:, :n_dates]
+        cases.values[0, 2, 0] += revision
+        cases.commit()
+
+        return cases
+
+    def run_rollups(self, path, continents):
+
+        store = get_store(path, 'csv')
+        store.write(continents, 'continents')
+        store.write(self.coordinates, 'coordinates')
+
+        with patch('make_rollups.get_rollups', wraps=get_rollups) as rollups:
+            make_rollups(in_path=path, out_path=path, backend='csv')
+
+        # Number of dates summed by this run
+        return rollups.call_args.kwargs['values'].shape[1]
+
+    def test_groupby(self):
+
+        regions, membership = get_membership(countries=self.countries,
+                                             continents=self.continents,
+                                             coordinates=self.coordinates)
+        expected_regions, expected = self.expected(continents=self.continents)
+
+        self.assertEqual(regions, expected_regions)
+        np.testing.assert_array_equal(get_rollups(values=self.values, membership=membership), expected)
+
+    def test_incremental(self):
+
+        moved = self.continents.assign(Continent=self.continents['Continent'].where(
+            self.continents['Country'] != 'Peru', 'Europe'))
+
+        # Runs with cases of (dates, revision) and continents
+        runs = [((29, 0), self.continents, 29),
+                ((30, 0), self.continents, REVISION_DAYS + 1),
+                ((30, 5), self.continents, 28),
+                ((30, 5), moved, 30)]
+
+        with tempfile.TemporaryDirectory() as path:
+            for (n_dates, revision), continents, n_computed in runs:
+                with self.subTest(n_dates=n_dates, revision=revision, moved=continents is moved):
+                    cases = self.write_cases(path, n_dates=n_dates, revision=revision)
+
+                    self.assertEqual(self.run_rollups(path, continents=continents), n_computed)
+
+                    regions, membership = get_membership(countries=self.countries,
+                                                         continents=continents,
+                                                         coordinates=self.coordinates)
+                    rollups = CasesMatrix(path=path, name='rollups')
+
+                    self.assertEqual(rollups.countries, regions)
+                    np.testing.assert_array_equal(rollups.values, get_rollups(values=cases.values,
+                                                                              membership=membership))
+
+                    del cases, rollups
+
+            # Same regions, so only the membership tells the runs apart
+            self.assertEqual(regions, ['Africa', 'Europe', 'South America', WORLD])
+
+class TestDailyChange(unittest.TestCase):
+
+    def setUp(self):
+
+        self.values = np.random.default_rng(0).integers(0, 100, (2, 30, 3)).cumsum(axis=1)
+
+    def test_diff(self):
+
+        diff = diff_matrix(self.values)
+
+        np.testing.assert_array_equal(diff[:, 0], 0)
+        np.testing.assert_array_equal(diff[:, 1:], np.diff(self.values, axis=1))
+        np.testing.assert_array_equal(diff_matrix(self.values, start=10), diff[:, 10:])
+
+    def test_rolling_mean(self):
+
+        expected = pd.DataFrame(self.values[1]).rolling(7).mean().to_numpy()
+
+        np.testing.assert_allclose(rolling_mean(self.values, window=7)[1], expected)
+        np.testing.assert_allclose(rolling_mean(self.values, window=7, start=3)[1], expected[3:])
+
+    def test_update_revised(self):
+
+        dates = pd.date_range('2020-01-22', periods=30)
+
+        with tempfile.TemporaryDirectory() as path:
+            for revision in [0, 5]:
+                cases = CasesMatrix.create(path=path, dates=dates, countries=['A', 'B', 'C'],
+                                           metrics=['Confirmed', 'Dead'], name='source')
+                cases.values[:] = self.values
+                cases.values[0, 2, 0] += revision
+                cases.commit()
+
+                starts = list()
+
+                def compute(start):
+                    starts.append(start)
+                    return diff_matrix(cases.values, start=start)
+
+                diff = update_matrix(path=path, name='diff', cases=cases, compute=compute, dtype=np.int64)
+
+            # Revision of an old date is recomputed from that date
+            self.assertEqual(starts, [2])
+            np.testing.assert_array_equal(diff.values, diff_matrix(cases.values))
+
+            del cases, diff
+
+class TestGrowthRates(unittest.TestCase):
+
+    def test_rolling_log_slope(self):
+
+        values = np.exp(np.arange(10) * np.log(2) / 3)[None, :, None] * [[[1, 5]]]
+        values[0, 4, 1] = 0
+
+        for start in [0, 6]:
+            rates = rolling_log_slope(values, window=3, start=start)
+
+            expected = np.full((1, 10, 2), np.log(2) / 3)
+            expected[:, :2] = np.nan
+            expected[0, 4:7, 1] = np.nan
+
+            np.testing.assert_allclose(rates, expected[:, start:])
+
+        np.testing.assert_allclose(get_doubling_times([np.log(2) / 3, 0, np.nan]), [3, np.nan, np.nan])
+
+class TestMortality(unittest.TestCase):
+
+    def test_mortality(self):
+
+        conf = make_cases([[0, 1, 1], [3, 4, 8], [6, 8, 9]])
+        dead = make_cases([[0, 0, 0], [1, 1, 1], [2, 3, 1]])
+
+        mort = get_mortality(confirmed=conf, dead=dead)
+
+        self.assertEqual(list(mort['Date']), list(conf['Date'][1:]))
+        np.testing.assert_array_equal(mort[['A', 'B', 'C']].to_numpy(),
+                                      [[33.33, 25.0, 12.5], [33.33, 37.5, 11.11]])
+
+        mort = get_mortality(confirmed=conf, dead=dead, mask_cells=True)
+
+        self.assertEqual(list(mort['Date']), list(conf['Date']))
+        np.testing.assert_array_equal(mort[['A', 'B', 'C']].to_numpy()[:2],
+                                      [[np.nan, 0.0, 0.0], [33.33, 25.0, 12.5]])
+
+class TestCasesSinceT0(unittest.TestCase):
+
+    def test_alignment(self):
+
+        conf = make_cases([[0, 5, 0], [10, 12, 0], [20, 30, 1]])
+
+        df = get_cases_since_t0(conf, n_cases_start=10)
+
+        np.testing.assert_array_equal(df.to_numpy(),
+                                      [[10, 12, np.nan], [20, 30, np.nan]])
+
+    def test_many_thresholds(self):
+
+        conf = make_cases([[0, 5, 0], [10, 12, 0], [20, 30, 1]])
+
+        since_t0 = get_cases_since_thresholds(conf, thresholds=[1, 20], n_days=3)
+
+        np.testing.assert_array_equal(since_t0[1].to_numpy(),
+                                      [[10, 5, 1], [20, 12, np.nan], [np.nan, 30, np.nan]])
+        np.testing.assert_array_equal(since_t0[20].to_numpy(),
+                                      [[20, 30, np.nan]])
+
+class TestCasesMatrix(unittest.TestCase):
+
+    def test_views(self):
+
+        frames = {'Confirmed': make_cases([[0, 1, 1], [3, 4, 8]]),
+                  'Dead': make_cases([[0, 0, 0], [1, 2, 3]])}
+
+        with tempfile.TemporaryDirectory() as path:
+            CasesMatrix.from_frames(path=path, frames=frames)
+
+            matrix = CasesMatrix(path=path)
+
+            np.testing.assert_array_equal(matrix.country('B'), [[1, 4], [0, 2]])
+            np.testing.assert_array_equal(matrix.get(metric='Dead', start='2020-01-23'), [[1, 2, 3]])
+            self.assertTrue(np.shares_memory(matrix.country('B'), matrix.values))
+            pd.testing.assert_frame_equal(matrix.to_frame('Confirmed'), frames['Confirmed'])
+
+            del matrix
+
+    def test_replace(self):
+
+        frames = {'Confirmed': make_cases([[0, 1, 1], [3, 4, 8]])}
+
+        with tempfile.TemporaryDirectory() as path:
+            CasesMatrix.from_frames(path=path, frames=frames)
+            reader = CasesMatrix(path=path)
+
+            writer = CasesMatrix.create(path=path, dates=pd.date_range('2020-01-22', periods=3),
+                                        countries=['A'], metrics=['Confirmed'])
+            writer.values[:] = 7
+
+            # Readers keep the previous matrix until commit
+            self.assertEqual(CasesMatrix(path=path).values.shape, (1, 2, 3))
+
+            writer.commit()
+
+            np.testing.assert_array_equal(CasesMatrix(path=path).values, [[[7], [7], [7]]])
+            np.testing.assert_array_equal(reader.country('C'), [[1, 8]])
+            self.assertEqual(sorted(os.listdir(path)), ['cases.json', 'cases.npy'])
+
+            del reader, writer
+
+    def test_snapshots(self):
+
+        frames = {'Confirmed': make_cases([[0, 1, 1], [3, 4, 8], [4, 5, 10]]),
+                  'Dead': make_cases([[0, 0, 0], [1, 2, 3], [1, 2, 4]])}
+
+        with tempfile.TemporaryDirectory() as path:
+            CasesMatrix.from_frames(path=path, frames=frames)
+
+            matrix = CasesMatrix(path=path)
+
+            stats = get_country_stats(cases=matrix)
+            self.assertEqual(stats.columns.to_list(), ['Country', 'Confirmed', 'Dead', 'Mortality'])
+            np.testing.assert_array_equal(stats['Mortality'], [25., 40., 40.])
+
+            # Dates without data fall back to the latest earlier date
+            stats = get_snapshots(cases=matrix, dates=['2020-01-22', '2020-02-01'])
+            np.testing.assert_array_equal(stats['Confirmed'], [0, 1, 1, 4, 5, 10])
+            np.testing.assert_array_equal(stats['Mortality'][:3], [np.nan, 0., 0.])
+
+            with self.assertRaises(KeyError):
+                get_snapshots(cases=matrix, dates=['2020-01-01'])
+
+            del matrix
+
+class TestWorldBank(unittest.TestCase):
+
+    def test_latest_values(self):
+
+        df = pd.DataFrame({'Country Code': pd.Categorical(['POL', 'POL', 'POL', 'DEU', 'DEU']),
+                           'Indicator': pd.Categorical(['GDP', 'GDP', 'Population', 'GDP', 'GDP'],
+                                                       categories=['GDP', 'Population', 'Life expectancy']),
+                           'Year': [2019, 2018, 2015, 2017, 2018],
+                           'Value': [2., 1., 38., 3., 4.]})
+
+        wide = get_world_bank_data(df=df)
+
+        self.assertEqual(wide.columns.to_list(), ['Country Code', 'GDP', 'Population', 'Life expectancy'])
+        self.assertEqual(wide['Country Code'].to_list(), ['DEU', 'POL'])
+        np.testing.assert_array_equal(wide['GDP'], [4., 2.])
+        np.testing.assert_array_equal(wide['Population'], [np.nan, 38.])
+
+    def test_indicators_asof(self):
+
+        panel = pd.DataFrame({'Date': pd.to_datetime(['2019-06-01', '2019-06-01', '2019-12-30',
+                                                      '2019-12-31', '2020-06-30']),
+                              'Country': ['Poland', 'Kosovo', 'Poland', 'Poland', 'Poland'],
+                              'Country Code': ['POL', None, 'POL', 'POL', 'POL']})
+
+        indicators = pd.DataFrame({'Country Code': ['POL', 'POL', 'POL'],
+                                   'Indicator': ['GDP', 'GDP', 'Population'],
+                                   'Year': [2019, 2017, 2020],
+                                   'Value': [2., 1., 38.]})
+
+        # Values of a year are known once it ends
+        joined = get_indicators_asof(panel=panel, indicators=indicators)
+
+        np.testing.assert_array_equal(joined['GDP'], [1., np.nan, 1., 2., 2.])
+        np.testing.assert_array_equal(joined['Population'], [np.nan] * 5)
+
+        # Or later when published with a lag
+        joined = get_indicators_asof(panel=panel, indicators=indicators, lag=pd.Timedelta(days=182))
+
+        np.testing.assert_array_equal(joined['GDP'], [1., np.nan, 1., 1., 2.])
+
+    def test_panel_duplicate_countries(self):
+
+        frames = {'Confirmed': make_cases([[0, 1, 1], [3, 4, 8]])}
+        codes = pd.Series(['AAA', 'BBB', 'BBX'], index=pd.Index(['A', 'B', 'B'], name='Country'))
+
+        with tempfile.TemporaryDirectory() as path:
+            panel = get_panel(cases=CasesMatrix.from_frames(path=path, frames=frames), codes=codes)
+
+        self.assertEqual(panel['Country Code'].fillna('').to_list(), ['AAA', 'BBB', ''] * 2)
+        self.assertEqual(panel['Confirmed'].to_list(), [0, 1, 1, 3, 4, 8])
+
+class TestRegression(unittest.TestCase):
+
+    def test_fit_pairs(self):
+
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'Continent': np.repeat(['Africa', 'Europe'], 20),
+                           'x': rng.normal(size=40),
+                           'y': rng.normal(size=40)})
+        df.loc[3, 'y'] = np.nan
+
+        fits = fit_pairs(df=df, by='Continent').set_index(['Continent', 'x', 'y'])
+
+        for continent, group in df.dropna().groupby('Continent'):
+            fit = fits.loc[(continent, 'x', 'y')]
+            expected = linregress(group['x'], group['y'])
+
+            self.assertEqual(fit['n'], len(group))
+            np.testing.assert_allclose([fit['slope'], fit['intercept'], fit['r'], fit['p_value'], fit['stderr']],
+                                       [expected.slope, expected.intercept, expected.rvalue,
+                                        expected.pvalue, expected.stderr])
+
+class TestStorage(unittest.TestCase):
+
+    def test_round_trip(self):
+
+        df = make_cases([[0, 1, 1], [3, 4, 8]])
+
+        for backend in BACKENDS:
+            with tempfile.TemporaryDirectory() as path:
+                get_store(path, backend).write(df, 'confirmed_cases')
+
+                store = get_store(path, backend=None)
+
+                self.assertEqual(store.extension, backend)
+                self.assertEqual(store.names(), ['confirmed_cases'])
+                pd.testing.assert_frame_equal(store.read('confirmed_cases'), df)
+
+if __name__ == '__main__':
+
+    unittest.main()
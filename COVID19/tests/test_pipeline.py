@@ -0,0 +1,165 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+
+import instrument
+from pipeline import Pipeline, Stage
+
+def copy_upper(src, dst):
+
+    with open(src) as f:
+        content = f.read()
+
+    with instrument.step('upper'):
+        instrument.count_file(src)
+
+        with open(dst, 'w') as f:
+            f.write(content.upper())
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+
+        self.raw = f'{self.path}/raw.txt'
+        self.mid = f'{self.path}/mid.txt'
+        self.out = f'{self.path}/out.txt'
+
+        with open(self.raw, 'w') as f:
+            f.write('abc')
+
+    def tearDown(self):
+
+        self.tmp.cleanup()
+
+    def make_pipeline(self):
+
+        stages = [Stage(copy_upper, inputs=[self.raw], outputs=[self.mid], name='mid', src=self.raw, dst=self.mid),
+                  Stage(copy_upper, inputs=[self.mid], outputs=[self.out], name='out', src=self.mid, dst=self.out)]
+
+        return Pipeline(stages=stages, manifest_path=f'{self.path}/manifest.json')
+
+    def test_second_run_skips(self):
+
+        self.assertEqual(self.make_pipeline().run(), ['mid', 'out'])
+        self.assertEqual(self.make_pipeline().run(), [])
+
+    def test_same_content_skips(self):
+
+        self.make_pipeline().run()
+
+        with open(self.raw, 'w') as f:
+            f.write('abc')
+
+        self.assertEqual(self.make_pipeline().run(), [])
+
+    def test_changed_input_reruns(self):
+
+        self.make_pipeline().run()
+
+        with open(self.raw, 'w') as f:
+            f.write('abcd')
+
+        self.assertEqual(self.make_pipeline().run(), ['mid', 'out'])
+
+        with open(self.out) as f:
+            self.assertEqual(f.read(), 'ABCD')
+
+    def test_unchanged_upstream_output_skips_downstream(self):
+
+        self.make_pipeline().run()
+
+        with open(self.raw, 'w') as f:
+            f.write('ABC')
+
+        self.assertEqual(self.make_pipeline().run(), ['mid'])
+
+    def test_dependencies(self):
+
+        pipeline = self.make_pipeline()
+
+        self.assertEqual(pipeline.dependencies(), {'mid': set(), 'out': {'mid'}})
+
+        pipeline.stages.reverse()
+        self.assertEqual([stage.name for stage in pipeline.ordered()], ['mid', 'out'])
+
+    def test_circular_dependency(self):
+
+        pipeline = self.make_pipeline()
+        pipeline.stages[0].inputs.append(self.out)
+
+        with self.assertRaises(ValueError):
+            pipeline.ordered()
+
+    def test_parallel_run(self):
+
+        self.assertEqual(self.make_pipeline().run(jobs=2), ['mid', 'out'])
+        self.assertEqual(self.make_pipeline().run(jobs=2), [])
+
+        with open(self.out) as f:
+            self.assertEqual(f.read(), 'ABC')
+
+    def test_report(self):
+
+        for jobs in [1, 2]:
+            with self.subTest(jobs=jobs):
+                recorder = instrument.enable(trace_memory=True)
+
+                try:
+                    self.make_pipeline().run(force=True, jobs=jobs)
+                finally:
+                    instrument.disable()
+
+                report = recorder.report()
+
+                self.assertEqual([stage['name'] for stage in report['stages']], ['mid', 'out'])
+
+                stage = report['stages'][0]
+                self.assertEqual(stage['counters'], {'bytes_read': 3})
+                self.assertEqual(stage['steps'][0]['name'], 'upper')
+                self.assertIn('peak_traced_mb', stage['steps'][0])
+
+    def test_peak_rss_per_step(self):
+
+        recorder = instrument.Recorder()
+
+        with recorder.stage('stage'):
+            with recorder.step('large'):
+                values = np.ones(2 ** 24)
+                del values
+
+            with recorder.step('small'):
+                pass
+
+        large, small = recorder.stages[0]['steps']
+
+        self.assertGreater(large['peak_rss_delta_mb'], 100)
+        self.assertGreaterEqual(recorder.stages[0]['peak_rss_mb'], large['peak_rss_mb'])
+
+        if instrument.reset_peak_rss():
+            # Peak of the later step doesn't include the earlier one
+            self.assertLess(small['peak_rss_delta_mb'], 10)
+            self.assertLess(small['peak_rss_mb'], large['peak_rss_mb'])
+
+    def test_invalid_jobs(self):
+
+        with self.assertRaises(ValueError):
+            self.make_pipeline().run(jobs=0)
+
+    def test_missing_output_reruns(self):
+
+        self.make_pipeline().run()
+        os.remove(self.out)
+
+        self.assertEqual(self.make_pipeline().run(), ['out'])
+
+if __name__ == '__main__':
+
+    unittest.main()
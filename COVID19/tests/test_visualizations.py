@@ -0,0 +1,449 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'visualizations'))
+
+import batch_render
+from batch_render import get_jobs, render_batch
+from cases_matrix import CasesMatrix
+from chart_cache import ChartCache, fingerprint_files
+from covid_data_viz import CovidDataViz, LazyData
+from covid_server import QueryServer, QueryService
+from ranking import RankingIndex
+from storage import CSVStore
+
+def make_processed(path):
+    """
+    Write a small set of processed datasets.
+    """
+
+    dates = pd.date_range('2020-01-22', periods=3)
+    frames = {metric: pd.DataFrame({'Date': dates, 'Poland': [0, 1, 2], 'Cape Verde': [1, 2, 4]})
+              for metric in ['Confirmed', 'Dead']}
+
+    CasesMatrix.from_frames(path=path, frames=frames)
+    CasesMatrix.from_frames(path=path, frames={metric: df.rename(columns={'Poland': 'Europe', 'Cape Verde': 'World'})
+                                               for metric, df in frames.items()}, name='rollups')
+
+    store = CSVStore(path)
+    store.write(frames['Confirmed'], 'confirmed_cases')
+    store.write(pd.DataFrame({'Country': ['Poland', 'Cape Verde'],
+                              'Confirmed': [2000, 4000],
+                              'Dead': [20, 400],
+                              'Mortality': [1., 10.]}), 'country_stats')
+
+class TestChartCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+        self.renders = list()
+
+    def tearDown(self):
+
+        self.tmp.cleanup()
+
+    def render(self, content):
+
+        def render(file_name):
+            self.renders.append(content)
+            with open(file_name, 'wb') as f:
+                f.write(content)
+
+        return render
+
+    def test_hit(self):
+
+        cache = ChartCache(path=self.path)
+        key = cache.key(chart='country_cases', params={'name': 'Poland'}, fingerprint=[['cases.npy', 1, 2]])
+
+        self.assertEqual(cache.read(key, self.render(b'a')), b'a')
+        self.assertEqual(cache.read(key, self.render(b'b')), b'a')
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        other = cache.key(chart='country_cases', params={'name': 'Poland'}, fingerprint=[['cases.npy', 1, 3]])
+        self.assertEqual(cache.read(other, self.render(b'c')), b'c')
+
+    def test_evict_least_recently_used(self):
+
+        cache = ChartCache(path=self.path, max_bytes=2)
+
+        for key in ['a', 'b']:
+            cache.put(key, self.render(b'x'))
+            os.utime(cache.file_name(key), (time.time() - 10, time.time() - 10))
+
+        cache.get('a')
+        cache.put('c', self.render(b'x'))
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_evict_expired(self):
+
+        cache = ChartCache(path=self.path, max_age=5)
+
+        cache.put('a', self.render(b'x'))
+        os.utime(cache.file_name('a'), (time.time() - 10, time.time() - 10))
+
+        self.assertIsNone(cache.get('a'))
+
+        cache.put('b', self.render(b'x'))
+        self.assertEqual(os.listdir(self.path), ['b.png'])
+
+    def test_keep_new_chart(self):
+
+        for options in [{'max_bytes': 10}, {'max_age': 0}]:
+            with self.subTest(**options):
+                cache = ChartCache(path=self.path, **options)
+                cache.put('a', self.render(b'x' * 20))
+
+                self.assertEqual(cache.read('b', self.render(b'y' * 20)), b'y' * 20)
+                self.assertEqual(os.listdir(self.path), ['b.png'])
+
+                cache.clear()
+
+    def test_fingerprint_files(self):
+
+        file_name = f'{self.path}/cases.npy'
+
+        with open(file_name, 'wb') as f:
+            f.write(b'x')
+
+        before = fingerprint_files([file_name])
+
+        with open(file_name, 'wb') as f:
+            f.write(b'xy')
+
+        self.assertNotEqual(fingerprint_files([file_name]), before)
+
+class TestChartKeys(unittest.TestCase):
+
+    def test_daily_change_dependencies(self):
+
+        with tempfile.TemporaryDirectory() as path:
+            make_processed(path)
+
+            store = CSVStore(path)
+            change = store.read('confirmed_cases')
+            store.write(change, 'confirmed_cases_daily_change')
+
+            viz = CovidDataViz(path=path, cache=ChartCache(path=f'{path}/cache'))
+            key = viz._chart_key(chart='country_cases_chg', name='Poland', n=3)
+
+            # Moving averages of the requested window
+            CasesMatrix.from_frames(path=path, frames={'Confirmed': change}, name='daily_change_3d', dtype=float)
+            self.assertNotEqual(viz._chart_key(chart='country_cases_chg', name='Poland', n=3), key)
+            key = viz._chart_key(chart='country_cases_chg', name='Poland', n=3)
+
+            # Daily changes shown next to them
+            store.write(change.assign(Poland=[0, 0, 0]), 'confirmed_cases_daily_change')
+            os.utime(store.file_name('confirmed_cases_daily_change'), ns=(0, 0))
+            self.assertNotEqual(viz._chart_key(chart='country_cases_chg', name='Poland', n=3), key)
+
+    def test_refresh_between_charts(self):
+
+        with tempfile.TemporaryDirectory() as path:
+            make_processed(path)
+
+            viz = CovidDataViz(path=path, cache=ChartCache(path=f'{path}/cache'))
+            before = viz.get_chart(chart='country_cases', name='Poland')
+
+            # Pipeline run with another day of data
+            frames = {metric: pd.DataFrame({'Date': pd.date_range('2020-01-22', periods=4),
+                                            'Poland': [0, 1, 2, 5], 'Cape Verde': [1, 2, 4, 4]})
+                      for metric in ['Confirmed', 'Dead']}
+            CasesMatrix.from_frames(path=path, frames=frames)
+
+            after = viz.get_chart(chart='country_cases', name='Poland')
+
+            self.assertNotEqual(after, before)
+            self.assertEqual(after, CovidDataViz(path=path).get_chart(chart='country_cases', name='Poland'))
+            self.assertEqual(len(viz.cases.dates), 4)
+
+class TestCorrelation(unittest.TestCase):
+
+    def test_corr_mat(self):
+
+        with tempfile.TemporaryDirectory() as path:
+            df = pd.DataFrame({'Country': list('ABCDE'),
+                               'Continent': ['Europe'] * 5,
+                               'GDP per capita': [1., 2., 3., 4., 6.],
+                               'Mortality %': [2., 1., 4., 3., 5.],
+                               'Life expectancy': [70., 75., 72., 80., 78.]})
+            CSVStore(path).write(df, 'world_bank')
+
+            C = CovidDataViz(path=path, backend='csv').get_corr_mat()
+
+            pd.testing.assert_frame_equal(C, df.corr(numeric_only=True))
+
+    def test_world_bank_at(self):
+
+        with tempfile.TemporaryDirectory() as path:
+            panel = pd.DataFrame({'Date': pd.to_datetime(['2020-01-22', '2020-01-22', '2020-01-24']),
+                                  'Country': ['Poland', 'Chile', 'Poland'],
+                                  'GDP': [1., 2., 3.]})
+            CSVStore(path).write(panel, 'world_bank_panel')
+
+            viz = CovidDataViz(path=path, backend='csv')
+
+            self.assertEqual(viz.get_world_bank_at('2020-01-23')['Country'].to_list(), ['Poland', 'Chile'])
+            self.assertEqual(viz.get_world_bank_at('2020-02-01')['GDP'].to_list(), [3.])
+
+            with self.assertRaises(KeyError):
+                viz.get_world_bank_at('2020-01-01')
+
+class TestLazyData(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+
+        make_processed(self.path)
+
+        self.store = CSVStore(self.path)
+        self.data = LazyData(store=self.store, datasets={'Confirmed': 'confirmed_cases',
+                                                          'Country stats': 'country_stats'})
+
+    def tearDown(self):
+
+        self.tmp.cleanup()
+
+    def test_load_on_first_access(self):
+
+        self.assertEqual(self.data.loaded, {})
+
+        df = self.data['Confirmed']
+
+        self.assertEqual(list(self.data.loaded), ['Confirmed'])
+        self.assertIs(self.data['Confirmed'], df)
+
+        with self.assertRaises(KeyError):
+            self.data['Nothing']
+
+    def test_release_idle(self):
+
+        self.data['Confirmed']
+        self.data['Country stats']
+        self.data.last_used['Confirmed'] -= 10
+
+        self.assertEqual(self.data.release(max_idle=5), ['Confirmed'])
+        self.assertEqual(list(self.data.loaded), ['Country stats'])
+
+    def test_read_again_after_release(self):
+
+        before = self.data['Country stats']
+
+        stats = before.assign(Dead=[30, 400])
+        self.store.write(stats, 'country_stats')
+
+        # Still the loaded version until released
+        self.assertIs(self.data['Country stats'], before)
+
+        self.data.release()
+
+        pd.testing.assert_frame_equal(self.data['Country stats'], stats)
+
+    def test_names_once_per_load(self):
+
+        CSVStore(self.path).write(pd.DataFrame({'Country': ['Poland', 'Cape Verde', 'Poland']}), 'coordinates')
+
+        viz = CovidDataViz(path=self.path)
+
+        self.assertEqual(viz.all_countries, ['Cape Verde', 'Poland'])
+        self.assertIs(viz.all_countries, viz.all_countries)
+
+        CSVStore(self.path).write(pd.DataFrame({'Country': ['Chile']}), 'coordinates')
+        viz.release()
+
+        self.assertEqual(viz.all_countries, ['Chile'])
+
+class TestBatchRender(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+
+        make_processed(self.path)
+
+    def tearDown(self):
+
+        self.tmp.cleanup()
+
+    def test_render_batch(self):
+
+        viz = CovidDataViz(path=self.path)
+        jobs = get_jobs(viz=viz, charts=['country_cases', 'world_cases'], countries=['Cape Verde'], continents=[])
+
+        self.assertEqual(jobs, [('country_cases', 'Cape Verde'), ('world_cases', 'World')])
+
+        for workers in [1, 2]:
+            out_path = f'{self.path}/img_{workers}'
+            files = render_batch(jobs=jobs, path=self.path, out_path=out_path, workers=workers)
+
+            self.assertEqual(files, [f'{out_path}/cape verde_cases.png', f'{out_path}/world_cases.png'])
+
+            for file_name in files:
+                with open(file_name, 'rb') as f:
+                    self.assertEqual(f.read(8), b'\x89PNG\r\n\x1a\n')
+
+    def test_preload(self):
+
+        store = CSVStore(self.path)
+        change = store.read('confirmed_cases')
+        store.write(change, 'confirmed_cases_daily_change')
+        CasesMatrix.from_frames(path=self.path, frames={'Confirmed': change}, name='daily_change_7d', dtype=float)
+
+        # Data of all charts in a batch is read before workers fork
+        batch_render.init_worker(path=self.path, charts=['country_cases_chg', 'world_cases'])
+        viz = batch_render._VIZ
+
+        self.assertEqual(sorted(viz._matrices), ['daily_change_7d', 'rollups'])
+        self.assertEqual(list(viz.data.loaded), ['Confirmed chg'])
+
+class TestRankingIndex(unittest.TestCase):
+
+    def test_top(self):
+
+        df = pd.DataFrame({'Country': ['A', 'B', 'C', 'D', 'E', 'F'],
+                           'Confirmed': [10, 500, 2000, 3000, 0, float('nan')],
+                           'Mortality': [50., 2., 5., 2., float('nan'), 90.]})
+
+        index = RankingIndex(df=df)
+
+        for stat in ['Confirmed', 'Mortality']:
+            for min_cases in [None, -1, 0, 100, 2000, 5000]:
+                for n in [1, 2, 10]:
+                    expected = df if min_cases is None else df[df['Confirmed'] > min_cases]
+                    expected = expected.sort_values(stat, ascending=False, kind='stable').head(n)
+                    expected = expected[['Country', stat]].reset_index(drop=True)
+
+                    pd.testing.assert_frame_equal(index.top(stat=stat, n=n, min_value=min_cases), expected)
+
+    def test_historical_rankings_bounded(self):
+
+        with tempfile.TemporaryDirectory() as path:
+            make_processed(path)
+
+            viz = CovidDataViz(path=path)
+            viz.ranking()
+
+            for date in ['2020-01-22', '2020-01-23', '2020-01-24', '2020-01-22']:
+                with patch('covid_data_viz.RANKING_DATES', 2):
+                    viz.ranking(date=date)
+
+            self.assertEqual(list(viz._rankings), [None, pd.Timestamp('2020-01-24'), pd.Timestamp('2020-01-22')])
+
+    def test_rankings_from_threads(self):
+
+        with tempfile.TemporaryDirectory() as path:
+            make_processed(path)
+
+            viz = CovidDataViz(path=path)
+            dates = [str(date.date()) for date in pd.date_range('2020-01-22', periods=3)] * 50
+
+            # Queries of the server run in executor threads
+            with patch('covid_data_viz.RANKING_DATES', 1), ThreadPoolExecutor(max_workers=8) as executor:
+                rankings = list(executor.map(viz.ranking, dates))
+
+            self.assertEqual(len(rankings), len(dates))
+            self.assertEqual(len(viz._rankings), 1)
+
+class TestQueryService(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+
+        make_processed(self.path)
+
+        self.service = QueryService(path=self.path, check_interval=0)
+
+    def tearDown(self):
+
+        self.tmp.cleanup()
+
+    def test_endpoints(self):
+
+        status, content_type, body = self.service.handle('/countries/Cape%20Verde')
+        self.assertEqual((status, content_type), (200, 'application/json'))
+        self.assertEqual([row['Confirmed'] for row in json.loads(body)], [1, 2, 4])
+
+        status, content_type, body = self.service.handle('/highest_mortality?n=1&format=csv')
+        self.assertEqual(body.decode().splitlines(), ['Country,Mortality', 'Cape Verde,10.0'])
+
+        status, content_type, body = self.service.handle('/highest_mortality?min_cases=0&format=csv&date=2020-01-22')
+        self.assertEqual(body.decode().splitlines(), ['Country,Mortality', 'Cape Verde,100.0'])
+
+        self.assertEqual(self.service.handle('/countries/Nowhere')[0], 404)
+        self.assertEqual(self.service.handle('/most_cases?date=2019-01-01')[0], 404)
+        self.assertEqual(self.service.handle('/most_cases?n=x')[0], 400)
+
+    def test_cache(self):
+
+        self.assertIsNone(self.service.get_cached('/most_cases?n=1&case_type=Dead'))
+
+        response = self.service.handle('/most_cases?n=1&case_type=Dead')
+        self.assertEqual(self.service.get_cached('/most_cases?case_type=Dead&n=1'), response)
+
+        # Rewriting data drops cached responses
+        stats = CSVStore(self.path).read('country_stats')
+        stats['Dead'] = [30, 400]
+        CSVStore(self.path).write(stats, 'country_stats')
+        os.utime(f'{self.path}/country_stats.csv', ns=(0, 0))
+
+        self.assertIsNone(self.service.get_cached('/most_cases?case_type=Dead&n=1'))
+
+        # So does rewriting any matrix
+        self.service.handle('/world')
+        CasesMatrix.from_frames(path=self.path,
+                                frames={'Confirmed': pd.DataFrame({'Date': pd.date_range('2020-01-22', periods=3),
+                                                                   'Poland': [0., 1., 1.]})},
+                                name='daily_change_7d')
+
+        self.assertIsNone(self.service.get_cached('/world'))
+
+    def test_server(self):
+
+        async def fetch():
+            server = QueryServer(service=self.service, port=0)
+            await server.start()
+
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+
+            responses = list()
+            for target in ['/world', '/continents/Europe?format=csv']:
+                writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+                await writer.drain()
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = int(head.split(b'Content-Length: ')[1].split(b'\r\n')[0])
+                responses.append((head.split()[1], await reader.readexactly(length)))
+
+            writer.close()
+            server.server.close()
+            await server.server.wait_closed()
+
+            return responses
+
+        responses = asyncio.run(fetch())
+
+        self.assertEqual([status for status, _ in responses], [b'200', b'200'])
+        self.assertTrue(responses[1][1].startswith(b'Date,Confirmed,Dead'))
+
+if __name__ == '__main__':
+
+    unittest.main()
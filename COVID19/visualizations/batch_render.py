@@ -0,0 +1,123 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from chart_cache import ChartCache
+from covid_data_viz import CHARTS, CovidDataViz
+
+# Shared by all renders in a process, see `init_worker`
+_VIZ = None
+
+def init_worker(path, backend=None, cache_path=None, charts=()):
+    """
+    Open processed data of `charts` once per worker process.
+
+    Workers forked after `init_worker` ran in the parent
+    reuse its data instead of reading it again.
+    """
+
+    global _VIZ
+
+    if _VIZ is None or _VIZ.path != path:
+        _VIZ = CovidDataViz(path=path, backend=backend)
+
+    # Matrices are memory mapped, pages are shared between workers
+    _VIZ.preload(charts=charts)
+
+    _VIZ.cache = None if cache_path is None else ChartCache(path=cache_path)
+
+def render(job, out_path='../img'):
+    """
+    Render one (chart, name) job to a png file,
+    returns path of the file.
+    """
+
+    chart, name = job
+
+    return _VIZ.save_chart(chart=chart, name=name, out_path=out_path)
+
+def _render(args):
+
+    return render(*args)
+
+def get_jobs(viz, charts, countries=None, continents=None):
+    """
+    List (chart, name) jobs, all countries and
+    continents by default.
+    """
+
+    countries = viz.all_countries if countries is None else countries
+    continents = viz.all_continents if continents is None else continents
+
+    jobs = list()
+    for chart in charts:
+        if chart.startswith('country'):
+            jobs += [(chart, country) for country in countries]
+        elif chart.startswith('continent'):
+            jobs += [(chart, continent) for continent in continents]
+        elif chart == 'world_cases':
+            jobs.append((chart, 'World'))
+        else:
+            raise ValueError(f'Unknown chart type: {chart}')
+
+    return jobs
+
+def render_batch(jobs, path='../data/processed', out_path='../img', backend=None, workers=None, chunksize=8,
+                 cache_path=None):
+    """
+
+    Render many charts across a pool of worker processes.
+
+    Inputs
+    ------
+    jobs : list of tuples
+        Pairs of (chart type, country or continent),
+        see `covid_data_viz.CHARTS` for chart types.
+    workers : int
+        Number of processes, one per core by default.
+        With 1 charts are rendered in this process.
+    chunksize : int
+        Jobs sent to a worker at a time.
+    cache_path : str
+        Directory of a `ChartCache`, charts with unchanged
+        data are copied from there instead of redrawn.
+
+    Returns list of written files in order of `jobs`.
+
+    """
+
+    os.makedirs(out_path, exist_ok=True)
+
+    charts = sorted({chart for chart, _ in jobs})
+
+    init_worker(path=path, backend=backend, cache_path=cache_path, charts=charts)
+
+    args = [(job, out_path) for job in jobs]
+
+    if workers == 1:
+        return [_render(a) for a in args]
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=init_worker,
+                             initargs=(path, backend, cache_path, charts)) as executor:
+        return list(executor.map(_render, args, chunksize=chunksize))
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Render charts of all countries and continents.')
+    parser.add_argument('--charts', nargs='+', choices=sorted(CHARTS), default=sorted(CHARTS))
+    parser.add_argument('--countries', nargs='+', help='Countries to render, all by default.')
+    parser.add_argument('--continents', nargs='+', help='Continents to render, all by default.')
+    parser.add_argument('--path', default='../data/processed')
+    parser.add_argument('--out', default='../img')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--cache', help='Directory of cached charts.')
+    args = parser.parse_args()
+
+    viz = CovidDataViz(path=args.path)
+    jobs = get_jobs(viz=viz, charts=args.charts, countries=args.countries, continents=args.continents)
+
+    files = render_batch(jobs=jobs, path=args.path, out_path=args.out, workers=args.workers,
+                         cache_path=args.cache)
+
+    print(f'Rendered {len(files)} charts to {args.out}.')
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import time
+
+# Total size of cached charts kept by default, in bytes
+DEFAULT_MAX_BYTES = 100 * 2 ** 20
+
+def fingerprint_files(paths):
+    """
+    Cheap fingerprint of data files from their size and
+    modification time, changes whenever a file is rewritten.
+    """
+
+    fingerprint = list()
+
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+        except FileNotFoundError:
+            fingerprint.append([os.path.basename(path), None, None])
+
+    return fingerprint
+
+class ChartCache(object):
+    """
+
+    Rendered charts stored as files, keyed on chart type,
+    parameters and a fingerprint of the data they show.
+
+    Inputs
+    ------
+    path : str
+        Directory with cached charts.
+    max_bytes : int
+        Total size of cached charts, least recently
+        used charts are removed first.
+    max_age : float
+        Charts not used for `max_age` seconds are removed,
+        None to keep them until `max_bytes` is reached.
+    extension : str
+        Image format of charts.
+
+    """
+
+    def __init__(self, path='../img/cache', max_bytes=DEFAULT_MAX_BYTES, max_age=None, extension='png'):
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.extension = extension
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(chart, params, fingerprint):
+        """
+
+        Hash of everything that determines how a chart looks.
+
+        """
+
+        content = json.dumps([chart, params, fingerprint], sort_keys=True, default=str)
+
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def file_name(self, key):
+
+        return f'{self.path}/{key}.{self.extension}'
+
+    def _is_expired(self, mtime, now):
+
+        return self.max_age is not None and now - mtime > self.max_age
+
+    def get(self, key):
+        """
+
+        Get file of a cached chart, None if it is not cached.
+
+        """
+
+        file_name = self.file_name(key)
+
+        try:
+            if self._is_expired(os.stat(file_name).st_mtime, time.time()):
+                return None
+
+            # Modification time marks last use
+            os.utime(file_name)
+        except FileNotFoundError:
+            return None
+
+        return file_name
+
+    def put(self, key, render):
+        """
+
+        Add a chart drawn by `render`, called with name
+        of the file to write to. Returns the cached file.
+
+        """
+
+        file_name = self.file_name(key)
+
+        # Keep extension so that the image format is inferred
+        tmp = f'{self.path}/{key}.{os.getpid()}.tmp.{self.extension}'
+        render(tmp)
+        os.replace(tmp, file_name)
+
+        # The new chart stays even if it alone is over the limits
+        self.evict(keep=file_name)
+
+        return file_name
+
+    def get_or_render(self, key, render):
+        """
+
+        Get file of a cached chart, rendering it first if needed.
+
+        """
+
+        file_name = self.get(key)
+
+        if file_name is not None:
+            self.hits += 1
+            return file_name
+
+        self.misses += 1
+
+        return self.put(key, render)
+
+    def read(self, key, render):
+        """
+
+        Get image of a chart as bytes.
+
+        """
+
+        with open(self.get_or_render(key, render), 'rb') as f:
+            return f.read()
+
+    def entries(self):
+        """
+
+        List cached charts as (last used, size, file name),
+        least recently used first.
+
+        """
+
+        entries = list()
+
+        for name in os.listdir(self.path):
+            if not name.endswith(f'.{self.extension}') or '.tmp.' in name:
+                continue
+
+            file_name = f'{self.path}/{name}'
+            try:
+                stat = os.stat(file_name)
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, file_name))
+
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        """
+
+        Remove expired charts, then least recently used
+        ones until the cache fits in `max_bytes`, except
+        file `keep`. Returns removed files.
+
+        """
+
+        entries = self.entries()
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+
+        removed = list()
+        for mtime, size, file_name in entries:
+            if file_name == keep or (not self._is_expired(mtime, now) and total <= self.max_bytes):
+                continue
+
+            try:
+                os.remove(file_name)
+            except FileNotFoundError:
+                pass
+
+            total -= size
+            removed.append(file_name)
+
+        return removed
+
+    def clear(self):
+
+        for _, _, file_name in self.entries():
+            os.remove(file_name)
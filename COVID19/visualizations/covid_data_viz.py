@@ -1,42 +1,498 @@
-from functools import reduce
+import io
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from IPython.display import display
-from scipy.stats import linregress
+from matplotlib.figure import Figure
+
+from chart_cache import fingerprint_files
+from ranking import RankingIndex
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'features'))
+
+from cases_matrix import CasesMatrix
+from make_country_stats import get_date_positions, get_snapshots
+from regression import fit_pairs
+from storage import get_store
+
+DATASETS = {'Confirmed': 'confirmed_cases',
+            'Confirmed chg': 'confirmed_cases_daily_change',
+            'Confirmed t0': 'confirmed_cases_since_t0',
+            'Recovered': 'recovered_cases',
+            'Dead': 'dead_cases',
+            'Active': 'active_cases',
+            'Mortality': 'mortality_rate',
+            'Coordinates': 'coordinates',
+            'Continents': 'continents',
+            'Ctry to cont': 'country_to_continent',
+            'Country stats': 'country_stats',
+            'World bank': 'world_bank',
+            'World bank panel': 'world_bank_panel',
+            'Doubling times': 'doubling_times'}
+
+# Ranking indexes of past dates kept, least recently used are dropped
+RANKING_DATES = 32
+
+# Chart type -> (name of the saved file, matrix files and
+# datasets with data shown), file names are formatted with
+# the window `n` of moving averages
+CHARTS = {'country_cases': ('{name}_cases.png', ['cases.npy', 'cases.json'], []),
+          'continent_cases': ('{name}_cases.png', ['rollups.npy', 'rollups.json'], []),
+          'world_cases': ('{name}_cases.png', ['rollups.npy', 'rollups.json'], []),
+          'country_cases_chg': ('{name}_cases_chg.png', ['daily_change_{n}d.npy', 'daily_change_{n}d.json'],
+                                ['Confirmed chg'])}
+
+class LazyData(MutableMapping):
+    """
+
+    Dictionary of datasets read from the store on first access.
+
+    Inputs
+    ------
+    store : storage.CSVStore
+        Store with processed data.
+    datasets : dict
+        Maps keys to dataset names in the store.
+
+    """
+
+    def __init__(self, store, datasets):
+
+        self.store = store
+        self.datasets = dict(datasets)
+        self.loaded = dict()
+        self.last_used = dict()
+        self.versions = dict()
+
+    def __getitem__(self, key):
+
+        if key not in self.loaded:
+            if key not in self.datasets:
+                raise KeyError(key)
+            self.versions[key] = self.version(key)
+            self.loaded[key] = self.store.read(self.datasets[key])
+
+        self.last_used[key] = time.monotonic()
+
+        return self.loaded[key]
+
+    def __setitem__(self, key, df):
+
+        self.loaded[key] = df
+        self.last_used[key] = time.monotonic()
+
+    def __delitem__(self, key):
+
+        self.datasets.pop(key, None)
+        self.release_dataset(key)
+
+    def __iter__(self):
+
+        return iter(sorted(set(self.datasets) | set(self.loaded)))
+
+    def __len__(self):
+
+        return len(set(self.datasets) | set(self.loaded))
+
+    def version(self, key):
+        """
+
+        Fingerprint of the file of a dataset, see
+        `chart_cache.fingerprint_files`.
+
+        """
+
+        return fingerprint_files([self.store.file_name(self.datasets[key])])
+
+    def changed(self):
+        """
+
+        Keys of loaded datasets whose files changed since they were read.
+
+        """
+
+        return [key for key, version in self.versions.items()
+                if key in self.loaded and self.version(key) != version]
+
+    def release_dataset(self, key):
+
+        self.loaded.pop(key, None)
+        self.last_used.pop(key, None)
+        self.versions.pop(key, None)
+
+    def release(self, max_idle=0):
+        """
+
+        Drop datasets not used in the last `max_idle` seconds,
+        they are read again when needed. Returns released keys.
+
+        Datasets assigned directly, without a name in the store,
+        are never released.
+
+        """
+
+        now = time.monotonic()
+
+        released = [key for key, used in self.last_used.items()
+                    if key in self.datasets and now - used >= max_idle]
+
+        for key in released:
+            self.release_dataset(key)
+
+        return released
 
 class CovidDataViz(object):
     """
 
     A class to make plots from processed COVID-19 and World Bank data.
 
+    Datasets are read when first used and kept in `data`,
+    see `release` to free memory of unused ones.
+
+    Charts rendered with `get_chart` and `save_chart` are
+    reused from `cache`, a `chart_cache.ChartCache`, while
+    the data they show is unchanged.
+
     """
 
-    def __init__(self, path='../data/processed'):
+    def __init__(self, path='../data/processed', backend=None, cache=None):
 
         self.path = path
-        self.data = dict()
-
-        self.data['Confirmed'] = pd.read_csv(f'{path}/confirmed_cases.csv')
-        self.data['Confirmed chg'] = pd.read_csv(f'{path}/confirmed_cases_daily_change.csv')        
-        self.data['Confirmed t0'] = pd.read_csv(f'{path}/confirmed_cases_since_t0.csv')
-        self.data['Recovered'] = pd.read_csv(f'{path}/recovered_cases.csv')
-        self.data['Dead'] = pd.read_csv(f'{path}/dead_cases.csv')
-        self.data['Active'] = pd.read_csv(f'{path}/active_cases.csv')
-        self.data['Mortality'] = pd.read_csv(f'{path}/mortality_rate.csv')
-        self.data['Coordinates'] = pd.read_csv(f'{path}/coordinates.csv')
-        self.data['Continents'] = pd.read_csv(f'{path}/continents.csv')            
-        self.data['Ctry to cont'] = pd.read_csv(f'{path}/country_to_continent.csv')
-        self.data['Country stats'] = pd.read_csv(f'{path}/country_stats.csv')        
-        self.data['World bank'] = pd.read_csv(f'{path}/world_bank.csv')
-
-        for _, df in self.data.items():
-            if 'Date' in df.columns:
-                df['Date'] = pd.to_datetime(df['Date'])
-
-        self.all_countries = sorted(set(self.data['Coordinates']['Country']))
-        self.all_continents = sorted(set(self.data['Continents']['Continent']))
+        self.store = get_store(path, backend)
+        self.cache = cache
+        self.data = LazyData(store=self.store, datasets=DATASETS)
+        self._fits = dict()
+        self._rankings = OrderedDict()
+        self._rankings_lock = threading.Lock()
+        self._matrices = dict()
+        self._names = dict()
+
+    @property
+    def cases(self):
+        """
+
+        Memory mapped matrix of case time series.
+
+        """
+
+        return self.matrix('cases')
+
+    @property
+    def rollups(self):
+        """
+
+        Memory mapped matrix of continent and world time series.
+
+        """
+
+        return self.matrix('rollups')
+
+    def rolling(self, n):
+        """
+
+        Memory mapped matrix of `n` day moving averages of daily
+        changes, None if the pipeline did not precompute it.
+
+        """
+
+        name = f'daily_change_{n}d'
+
+        if name not in self._matrices and not os.path.exists(f'{self.path}/{name}.npy'):
+            return None
+
+        return self.matrix(name)
+
+    def matrix(self, name):
+        """
+
+        Memory mapped matrix `name`, kept open until
+        `refresh` finds that its files changed.
+
+        """
+
+        if name not in self._matrices:
+            version = fingerprint_files([f'{self.path}/{name}.npy', f'{self.path}/{name}.json'])
+            self._matrices[name] = (version, CasesMatrix(path=self.path, name=name))
+
+        return self._matrices[name][1]
+
+    def preload(self, charts, n=7):
+        """
+
+        Open the matrices and read the datasets that `charts` are
+        drawn from, eg. before forking processes that share them.
+
+        """
+
+        for chart in charts:
+            _, matrices, datasets = CHARTS[chart]
+
+            for name in {os.path.splitext(f.format(n=n))[0] for f in matrices}:
+                if os.path.exists(f'{self.path}/{name}.npy'):
+                    self.matrix(name)
+
+            for key in datasets:
+                self.data[key]
+
+    def refresh(self):
+        """
+
+        Reopen matrices and datasets whose files changed since
+        they were opened, eg. by a run of the feature pipeline.
+        Returns names of the matrices and keys of the datasets.
+
+        """
+
+        matrices = [name for name, (version, _) in self._matrices.items()
+                    if fingerprint_files([f'{self.path}/{name}.npy', f'{self.path}/{name}.json']) != version]
+
+        for name in matrices:
+            del self._matrices[name]
+
+        datasets = self.data.changed()
+
+        for key in datasets:
+            self.data.release_dataset(key)
+
+        if 'cases' in matrices:
+            # Rankings of past dates are built from cases
+            with self._rankings_lock:
+                for key in [k for k in self._rankings if k is not None]:
+                    del self._rankings[key]
+
+        return matrices + datasets
+
+    @property
+    def all_countries(self):
+
+        return self._sorted_names(key='Coordinates', column='Country')
+
+    @property
+    def all_continents(self):
+
+        return self._sorted_names(key='Continents', column='Continent')
+
+    def _sorted_names(self, key, column):
+        """
+
+        Sorted unique values of a column, computed
+        once per load of the dataset.
+
+        """
+
+        df = self.data[key]
+        cached = self._names.get(key)
+
+        if cached is None or cached[0] is not df:
+            cached = (df, sorted(set(df[column])))
+            self._names[key] = cached
+
+        return cached[1]
+
+    def release(self, max_idle=0):
+        """
+
+        Release datasets not used in the last `max_idle` seconds.
+
+        """
+
+        with self._rankings_lock:
+            self._rankings.clear()
+
+        self._names.clear()
+
+        return self.data.release(max_idle=max_idle)
+
+    def ranking(self, date=None):
+        """
+
+        Get `ranking.RankingIndex` of country statistics,
+        latest by default or as of `date`.
+
+        Indexes are built once per loaded `Country stats`
+        and per date, for up to `RANKING_DATES` past dates.
+        Safe to call from several threads.
+
+        """
+
+        if date is None:
+            stats = self.data['Country stats']
+            key = None
+        else:
+            key = self.cases.dates[get_date_positions(cases=self.cases, dates=[date])[0]]
+            stats = None
+
+        with self._rankings_lock:
+            cached = self._rankings.get(key)
+
+        # Latest index is rebuilt when `Country stats` is read again,
+        # threads asking for the same one may each build it
+        if cached is None or (stats is not None and cached[0] is not stats):
+            if stats is None:
+                stats = get_snapshots(cases=self.cases, dates=[key]).drop('Date', axis=1)
+
+            cached = (stats, RankingIndex(df=stats))
+
+        with self._rankings_lock:
+            self._rankings[key] = cached
+            self._rankings.move_to_end(key)
+
+            # The latest index doesn't count towards the limit
+            dates = [k for k in self._rankings if k is not None]
+            for k in dates[:max(len(dates) - RANKING_DATES, 0)]:
+                del self._rankings[k]
+
+        return cached[1]
+
+    def make_chart(self, chart, name, n=7):
+        """
+
+        Draw a chart of country, continent or world `name`
+        on a new figure, see `CHARTS` for chart types.
+
+        """
+
+        # Figures created without pyplot are not kept
+        # in its global registry
+        fig = Figure()
+        ax = fig.subplots()
+
+        if chart == 'country_cases':
+            draw_ts(ax=ax, df=self.get_country_ts(country=name), title=name)
+        elif chart == 'continent_cases':
+            draw_ts(ax=ax, df=self.get_continent_ts(continent=name), title=name)
+        elif chart == 'world_cases':
+            draw_ts(ax=ax, df=self.get_world_ts(), title=name)
+        elif chart == 'country_cases_chg':
+            draw_cases_chg(ax=ax, df=self.get_country_chg(country=name, n=n), title=name, n=n)
+        else:
+            raise ValueError(f'Unknown chart type: {chart}')
+
+        fig.tight_layout()
+
+        return fig
+
+    def _render_chart(self, chart, name, n, target):
+
+        fig = self.make_chart(chart=chart, name=name, n=n)
+
+        try:
+            fig.savefig(target, format='png')
+        finally:
+            fig.clear()
+
+    def _chart_key(self, chart, name, n):
+        """
+
+        Cache key of a chart from its parameters and the files of
+        the data it shows, call after `refresh` so that the data
+        drawn is the data fingerprinted.
+
+        """
+
+        _, matrices, datasets = CHARTS[chart]
+
+        params = {'name': name, 'n': n} if chart == 'country_cases_chg' else {'name': name}
+        files = [f'{self.path}/' + f.format(n=n) for f in matrices]
+        files += [self.store.file_name(DATASETS[key]) for key in datasets]
+
+        return self.cache.key(chart=chart, params=params, fingerprint=fingerprint_files(files))
+
+    def get_chart(self, chart, name, n=7):
+        """
+
+        Render a chart to png, returns the image as bytes.
+
+        """
+
+        self.refresh()
+
+        render = lambda target: self._render_chart(chart=chart, name=name, n=n, target=target)
+
+        if self.cache is not None:
+            return self.cache.read(key=self._chart_key(chart=chart, name=name, n=n), render=render)
+
+        buffer = io.BytesIO()
+        render(buffer)
+
+        return buffer.getvalue()
+
+    def save_chart(self, chart, name, n=7, out_path='../img'):
+        """
+
+        Render a chart to a png file in `out_path`,
+        returns name of the file.
+
+        """
+
+        self.refresh()
+
+        file_name = f'{out_path}/' + CHARTS[chart][0].format(name=name.lower())
+        render = lambda target: self._render_chart(chart=chart, name=name, n=n, target=target)
+
+        if self.cache is None:
+            render(file_name)
+        else:
+            cached = self.cache.get_or_render(key=self._chart_key(chart=chart, name=name, n=n), render=render)
+            shutil.copyfile(cached, file_name)
+
+        return file_name
+
+    def get_fits(self, x=None, y=None, by=None, data='World bank'):
+        """
+
+        Get linear fits of every pair of columns `x` and `y`
+        of dataset `data`, see `regression.fit_pairs`.
+
+        Fits are kept until the dataset file changes.
+
+        """
+
+        key = (data, None if x is None else tuple(x), None if y is None else tuple(y), by)
+        version = fingerprint_files([self.store.file_name(DATASETS[data])])
+
+        cached = self._fits.get(key)
+
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        if cached is not None:
+            # Read the new version of the dataset
+            self.data.release_dataset(data)
+
+        fits = fit_pairs(df=self.data[data], x=x, y=y, by=by)
+        self._fits[key] = (version, fits)
+
+        return fits
+
+    def get_fit(self, x, y, continent=None):
+        """
+
+        Get fit of World Bank column `y` on `x`,
+        of countries of one continent if given.
+
+        """
+
+        if continent is None:
+            fits = self.get_fits()
+        else:
+            fits = self.get_fits(by='Continent')
+            fits = fits[fits['Continent'] == continent]
+
+        fit = fits[(fits['x'] == x) & (fits['y'] == y)]
+
+        if fit.empty:
+            raise KeyError((x, y, continent))
+
+        return fit.iloc[0]
 
     def list_highest_mortality(self, n=10):
         """
@@ -60,93 +516,98 @@ class CovidDataViz(object):
 
         """
 
-        dfs = [self.data['Confirmed'][['Date', country]],
-               self.data['Recovered'][['Date', country]],
-               self.data['Dead'][['Date', country]],
-               self.data['Active'][['Date', country]]]
+        return self.cases.country_frame(country)
 
-        df = reduce(lambda x, y: pd.merge(x, y, on='Date', how='outer'), dfs)                   
+    def get_continent_ts(self, continent):
+        """
 
-        df.columns = ['Date', 'Confirmed', 'Recovered', 'Dead', 'Active']
+        Get continent level cases time series.
 
-        return df
+        """
 
-    def get_continent_ts(self, continent):
+        return self.rollups.country_frame(continent)
+
+    def get_world_ts(self):
         """
 
-        Get continent level cases time series.
+        Get world level cases time series.
 
         """
 
-        cont = self.data['Continents'].copy()
-        cont = cont[cont['Continent'] == continent]
+        return self.rollups.country_frame('World')
+    
+    def get_world_bank_at(self, date):
+        """
 
-        cont = pd.merge(self.data['Coordinates'], cont, on='Country')
+        Get cases by country on `date` with World Bank
+        indicators known at that date.
 
-        countries = sorted(list(cont['Country']))
+        """
 
-        cases = ['Confirmed', 'Recovered', 'Dead', 'Active']
+        df = self.data['World bank panel']
 
-        dfs = []
-        for c in cases:
-            tmp = self.data[c][countries].sum(axis=1)
-            tmp.name = c
-            tmp = tmp.to_frame()
-            tmp['Date'] = self.data[c]['Date']
-            dfs.append(tmp)
+        dates = pd.DatetimeIndex(df['Date'].unique()).sort_values()
+        pos = dates.searchsorted(pd.Timestamp(date), side='right') - 1
 
-        df = reduce(lambda x, y: pd.merge(x, y, on='Date', how='outer'), dfs)                   
+        if pos < 0:
+            raise KeyError(f'No data before {pd.Timestamp(date).date()}')
 
-        df = df[['Date'] + cases]
+        df = df[df['Date'] == dates[pos]].reset_index(drop=True)
 
         return df
 
-    def get_world_ts(self):
+    def get_fastest_growth(self, n=10, window=7, level='Country'):
         """
 
-        Get world level cases time series.
+        Get `n` countries, continents or world with the
+        shortest current doubling time of confirmed cases.
 
         """
 
-        cases = ['Confirmed', 'Recovered', 'Dead', 'Active']
+        column = f'Doubling time {window}d'
 
-        dfs = []
+        df = self.data['Doubling times']
+        df = df[df['Level'] == level]
+        df = df.nsmallest(n, column)
+        df = df[['Country', f'Growth rate {window}d', column]]
+        df = df.reset_index(drop=True)
 
-        for case in cases:
-            tmp = self.data[case].drop('Date', axis=1).sum(axis=1)
-            tmp.name = case
-            tmp = tmp.to_frame()
-            tmp['Date'] = self.data[case]['Date']
-            dfs.append(tmp)
+        return df
 
-        df = reduce(lambda x, y: pd.merge(x, y, on='Date', how='outer'), dfs)                   
+    def get_growth_ts(self, name, window=7):
+        """
 
-        return df
-    
-    def get_highest_mortality(self, n_countries, min_cases=1000):
+        Get daily growth rate time series of a country,
+        continent or world, fitted over `window` days.
+
+        """
+
+        matrix = CasesMatrix(path=self.path, name=f'cases_growth_{window}d')
+
+        if name not in matrix.countries:
+            matrix = CasesMatrix(path=self.path, name=f'rollups_growth_{window}d')
+
+        return matrix.country_frame(name)
+
+    def get_highest_mortality(self, n_countries, min_cases=1000, date=None):
         """
         
         List countries with highest moratlity rate.
 
         """
 
-        df = self.data['Country stats']
-        df = df[df['Confirmed'] > min_cases]
-        df = df.sort_values('Mortality', ascending=False).copy()
-        df = df.reset_index(drop=True)
-        df = df.head(n_countries)
-        df = df[['Country', 'Mortality']]
+        df = self._sort_ctry_stats(stat_name='Mortality', min_cases=min_cases, n=n_countries, date=date)
             
         return df
 
-    def get_most_cases(self, case_type, n=10):
+    def get_most_cases(self, case_type, n=10, date=None):
         """
 
         Get n countries with most cases.
 
         """
 
-        df = self._sort_ctry_stats(stat_name=case_type, n=n)
+        df = self._sort_ctry_stats(stat_name=case_type, n=n, date=date)
         return df        
       
     def plot_world_cases(self):
@@ -191,22 +652,13 @@ class CovidDataViz(object):
 
         """
 
-        cols = sorted(df.drop('Date', axis=1).columns)
-
-        plt.figure()
+        fig, ax = plt.subplots()
 
-        for col in cols:
-            plt.plot(df['Date'], df[col], label=col)
-            
-        plt.xlim(df['Date'].min(), df['Date'].max())
-        plt.ylim(0)
-        plt.title(f'{title}')
-        plt.ylabel('Cases')
-        plt.legend(loc='best')
+        draw_ts(ax=ax, df=df, title=title)
 
-        plt.savefig(f'../img/{title.lower()}_cases.png')
+        fig.savefig(f'../img/{title.lower()}_cases.png')
 
-        plt.tight_layout()            
+        fig.tight_layout()
 
     def plot_highest_country_stats(self, statistic, n=10):
         """
@@ -304,35 +756,45 @@ class CovidDataViz(object):
             
         plt.show()    
 
-    def plot_country_cases_chg(self, country, n=7):
+    def get_country_chg(self, country, n=7):
         """
 
-        Plot country level change in cases with n day moving average.        
+        Get daily new confirmed cases of a country with n day
+        moving average, precomputed by the feature pipeline
+        for common windows.
 
         """
 
         df = self.data['Confirmed chg'][['Date', country]].copy()
         df = df.rename(columns={country: 'New cases'})
-        
-        plt.plot(df['Date'], df['New cases'],
-                 label='New cases', alpha=1/2)
-        
-        plt.fill_between(df['Date'], y1=0, y2=df['New cases'], alpha=1/4)
-        
-        plt.plot(df['Date'], df['New cases'].rolling(n).mean(), 
-                 label=f'{n} day average', c='black')    
-        
-        plt.xlim(df['Date'].min(), df['Date'].max())
-        plt.ylim(0)
 
-        plt.title(f'{country}')
-        plt.ylabel('Daily new cases')
-        plt.legend(loc='best')
-        plt.tight_layout()
-        plt.savefig(f'../img/{country.lower()}_cases_chg.png')
-        plt.show()  
+        rolling = self.rolling(n)
+
+        if rolling is not None:
+            df['Average'] = rolling.get(metric='Confirmed', country=country)
+        else:
+            df['Average'] = df['New cases'].rolling(n).mean()
+
+        return df
+
+    def plot_country_cases_chg(self, country, n=7):
+        """
+
+        Plot country level change in cases with n day moving average.        
 
-    def plot_with_slope(self, x, y):
+        """
+
+        df = self.get_country_chg(country=country, n=n)
+
+        fig, ax = plt.subplots()
+
+        draw_cases_chg(ax=ax, df=df, title=country, n=n)
+
+        fig.tight_layout()
+        fig.savefig(f'../img/{country.lower()}_cases_chg.png')
+        plt.show()
+
+    def plot_with_slope(self, x, y, continent=None):
         """
 
         Create scatter plot with regression line and 
@@ -340,16 +802,19 @@ class CovidDataViz(object):
 
         """
 
-        X = self.data['World bank'][x]
-        Y = self.data['World bank'][y]
+        df = self.data['World bank']
 
-        X_reg = np.linspace(np.min(X), np.max(X), 1000)
+        if continent is not None:
+            df = df[df['Continent'] == continent]
 
-        # Estimate Y = aX +b
-        a, b, c, p, _ = linregress(X, Y)
+        X = df[x]
+        Y = df[y]
 
-        # Get r squared
-        r = c * c
+        X_reg = np.linspace(np.min(X), np.max(X), 1000)
+
+        # Estimate Y = aX +b, fits of all pairs are computed at once
+        fit = self.get_fit(x=x, y=y, continent=continent)
+        a, b, r = fit['slope'], fit['intercept'], fit['r2']
 
         Y_reg = a * X_reg + b
         label_reg = f'y = {round(a, 4)}x + {round(b, 4)}'
@@ -379,24 +844,34 @@ class CovidDataViz(object):
         plt.tight_layout()
         plt.show()        
  
-    def _sort_ctry_stats(self, stat_name, min_cases=5000, n=10):
+    def _sort_ctry_stats(self, stat_name, min_cases=5000, n=10, date=None):
         """
 
-        Sort the dataframe of country statistics using a cutoff
-        of `min_cases` and return top `n` countries.
+        Get top `n` countries by `stat_name` of those with more
+        than `min_cases` confirmed cases, latest or as of `date`.
 
         """
 
-        df = self.data['Country stats'].copy()
-        df['Has min cases'] = df['Confirmed'] > min_cases
-        df = df[df['Has min cases'] == True]
-        df = df.sort_values(stat_name, ascending=False)
-        df = df.reset_index(drop=True)
-        df = df[['Country', stat_name]]    
-        df = df.head(n)
+        df = self.ranking(date=date).top(stat=stat_name, n=n, min_value=min_cases)
 
         return df
 
+    def get_corr_mat(self):
+        """
+
+        Get correlation matrix of World Bank columns
+        from the fits of all their pairs.
+
+        """
+
+        cols = self.data['World bank'].select_dtypes('number').columns
+
+        C = self.get_fits().pivot(index='x', columns='y', values='r')
+        C = C.reindex(index=cols, columns=cols).to_numpy(copy=True)
+        np.fill_diagonal(C, 1.)
+
+        return pd.DataFrame(C, index=cols, columns=cols)
+
     def show_corr_mat(self):
         """
 
@@ -404,13 +879,53 @@ class CovidDataViz(object):
 
         """
 
-        C = self.data['World bank'].corr()
+        C = self.get_corr_mat()
         C = C.style.background_gradient(cmap='coolwarm')
         C = C.set_precision(2)
         C = C.set_table_attributes('style="font-size: 13px"')
         
         display(C)
 
+def draw_ts(ax, df, title):
+    """
+
+    Draw cases time series on `ax`, one line per column.
+
+    """
+
+    cols = sorted(df.drop('Date', axis=1).columns)
+
+    for col in cols:
+        ax.plot(df['Date'], df[col], label=col)
+
+    ax.set_xlim(df['Date'].min(), df['Date'].max())
+    ax.set_ylim(0)
+    ax.set_title(f'{title}')
+    ax.set_ylabel('Cases')
+    ax.legend(loc='best')
+
+def draw_cases_chg(ax, df, title, n=7):
+    """
+
+    Draw daily new cases with n day moving average on `ax`.
+
+    """
+
+    ax.plot(df['Date'], df['New cases'],
+            label='New cases', alpha=1/2)
+
+    ax.fill_between(df['Date'], y1=0, y2=df['New cases'], alpha=1/4)
+
+    ax.plot(df['Date'], df['Average'],
+            label=f'{n} day average', c='black')
+
+    ax.set_xlim(df['Date'].min(), df['Date'].max())
+    ax.set_ylim(0)
+
+    ax.set_title(f'{title}')
+    ax.set_ylabel('Daily new cases')
+    ax.legend(loc='best')
+
 def exp_growth(a, b, t, tau):
     """
     
@@ -0,0 +1,323 @@
+import argparse
+import asyncio
+import glob
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from chart_cache import fingerprint_files
+from covid_data_viz import CovidDataViz
+from storage import get_store
+
+# Responses kept in memory
+DEFAULT_CACHE_SIZE = 1024
+
+# Seconds between checks whether processed data changed
+CHECK_INTERVAL = 5
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+CONTENT_TYPES = {'json': 'application/json', 'csv': 'text/csv'}
+
+class QueryService(object):
+    """
+
+    Answer queries about processed data with JSON or CSV,
+    keeping recent responses until the data changes.
+
+    Inputs
+    ------
+    path : str
+        Directory with processed data.
+    backend : str
+        Storage backend, detected from files in `path` by default.
+    cache_size : int
+        Number of responses kept, least recently used are dropped.
+
+    Notes
+    -----
+    Endpoints, all GET, with `format=json` (default) or `format=csv`:
+
+        /countries/<country>
+        /continents/<continent>
+        /world
+        /most_cases?case_type=Confirmed&n=10
+        /highest_mortality?n=10&min_cases=1000
+
+    Rankings take an optional `date=YYYY-MM-DD` to rank as of that date.
+
+    """
+
+    def __init__(self, path='../data/processed', backend=None, cache_size=DEFAULT_CACHE_SIZE,
+                 check_interval=CHECK_INTERVAL):
+
+        self.path = path
+        self.backend = backend
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._checked = 0
+        self.viz = None
+
+        self.check_data()
+
+    def data_version(self):
+
+        store = get_store(self.path, self.backend)
+        files = [store.file_name(name) for name in store.names()]
+
+        # Memory mapped matrices, eg. cases, rollups, daily change
+        # and growth rates
+        files += sorted(glob.glob(f'{self.path}/*.npy') + glob.glob(f'{self.path}/*.json'))
+
+        return fingerprint_files(files)
+
+    def check_data(self):
+        """
+
+        Reopen processed data and drop cached responses
+        if files changed since the last check.
+
+        """
+
+        now = time.monotonic()
+
+        if self.viz is not None and now - self._checked < self.check_interval:
+            return
+
+        self._checked = now
+        version = self.data_version()
+
+        if version != self._version:
+            self.viz = CovidDataViz(path=self.path, backend=self.backend)
+            with self.lock:
+                self.responses.clear()
+            self._version = version
+
+    def query(self, endpoint, args):
+        """
+
+        Get dataframe answering a query.
+
+        """
+
+        viz = self.viz
+        parts = [unquote(p) for p in endpoint.strip('/').split('/')]
+
+        if parts[0] == 'countries' and len(parts) == 2:
+            return viz.get_country_ts(country=parts[1])
+
+        if parts[0] == 'continents' and len(parts) == 2:
+            return viz.get_continent_ts(continent=parts[1])
+
+        if parts == ['world']:
+            return viz.get_world_ts()
+
+        if parts == ['most_cases']:
+            return viz.get_most_cases(case_type=args.get('case_type', 'Confirmed'),
+                                      n=int(args.get('n', 10)),
+                                      date=args.get('date'))
+
+        if parts == ['highest_mortality']:
+            return viz.get_highest_mortality(n_countries=int(args.get('n', 10)),
+                                             min_cases=int(args.get('min_cases', 1000)),
+                                             date=args.get('date'))
+
+        raise LookupError(f'Unknown endpoint: {endpoint}')
+
+    @staticmethod
+    def encode(df, fmt):
+
+        if fmt == 'csv':
+            return df.to_csv(index=False).encode()
+
+        return df.to_json(orient='records', date_format='iso').encode()
+
+    def cache_key(self, target):
+
+        url = urlsplit(target)
+
+        return url.path, tuple(sorted(parse_qsl(url.query)))
+
+    def get_cached(self, target):
+        """
+
+        Get cached (status, content type, body) of a request, None on miss.
+
+        """
+
+        self.check_data()
+
+        key = self.cache_key(target)
+
+        with self.lock:
+            response = self.responses.get(key)
+
+            if response is not None:
+                self.responses.move_to_end(key)
+                self.hits += 1
+
+        return response
+
+    def handle(self, target):
+        """
+
+        Answer a request, returns (status, content type, body).
+
+        """
+
+        key = self.cache_key(target)
+        endpoint, args = key[0], dict(key[1])
+        fmt = args.pop('format', 'json')
+
+        if fmt not in CONTENT_TYPES:
+            return error(400, f'Unknown format: {fmt}')
+
+        try:
+            df = self.query(endpoint=endpoint, args=args)
+        except LookupError as e:
+            return error(404, f'Not found: {e.args[0]}' if e.args else 'Not found')
+        except ValueError as e:
+            return error(400, str(e))
+
+        response = (200, CONTENT_TYPES[fmt], self.encode(df, fmt))
+
+        with self.lock:
+            self.misses += 1
+            self.responses[key] = response
+            if len(self.responses) > self.cache_size:
+                self.responses.popitem(last=False)
+
+        return response
+
+def error(status, message):
+
+    return status, CONTENT_TYPES['json'], json.dumps({'error': message}).encode()
+
+async def read_request(reader):
+    """
+    Read request line and headers, None at end of connection.
+    """
+
+    line = await reader.readline()
+
+    if not line:
+        return None
+
+    method, target, version = line.decode('latin-1').split()
+
+    headers = dict()
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    return method, target, version, headers
+
+def format_response(status, content_type, body, keep_alive=True):
+
+    head = (f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+
+    return head.encode('latin-1') + body
+
+class QueryServer(object):
+    """
+
+    Serve a `QueryService` over HTTP/1.1 with asyncio.
+
+    Connections are handled concurrently and kept alive between
+    requests. Cached responses are sent from the event loop, other
+    queries run in a thread pool so that slow ones don't block it.
+
+    """
+
+    def __init__(self, service, host='127.0.0.1', port=8000):
+
+        self.service = service
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def respond(self, method, target):
+
+        if method != 'GET':
+            return error(405, f'Method not allowed: {method}')
+
+        response = self.service.get_cached(target)
+
+        if response is None:
+            loop = asyncio.get_running_loop()
+            try:
+                response = await loop.run_in_executor(None, self.service.handle, target)
+            except Exception as e:
+                response = error(500, repr(e))
+
+        return response
+
+    async def handle_connection(self, reader, writer):
+
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (ValueError, ConnectionError):
+                    break
+
+                if request is None:
+                    break
+
+                method, target, version, headers = request
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                response = await self.respond(method, target)
+
+                writer.write(format_response(*response, keep_alive=keep_alive))
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+        return self.server
+
+    async def serve_forever(self):
+
+        await self.start()
+        print(f'Serving {self.service.path} on http://{self.host}:{self.port}')
+
+        async with self.server:
+            await self.server.serve_forever()
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Serve processed COVID-19 data over HTTP.')
+    parser.add_argument('--path', default='../data/processed')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE)
+    args = parser.parse_args()
+
+    service = QueryService(path=args.path, cache_size=args.cache_size)
+    server = QueryServer(service=service, host=args.host, port=args.port)
+
+    asyncio.run(server.serve_forever())
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+class RankingIndex(object):
+    """
+
+    Answer top `n` queries on a table of statistics by country,
+    for any statistic and cutoff of a threshold column.
+
+    Built once per table: countries are sorted by the threshold
+    column, so those above a cutoff are found with a binary search,
+    and by each statistic, so a query picks the `n` best ranks among
+    those countries with a partial selection instead of sorting.
+
+    Inputs
+    ------
+    df : pd.DataFrame
+        Statistics, one row per country.
+    key : str
+        Column with country names.
+    threshold : str
+        Column compared with cutoffs, eg. `Confirmed`.
+    stats : list of str
+        Columns to rank by, all numeric columns by default.
+
+    Notes
+    -----
+    Rows are ranked by statistic in descending order with missing
+    values last, ties keep the order of rows in `df`.
+
+    """
+
+    def __init__(self, df, key='Country', threshold='Confirmed', stats=None):
+
+        self.key = key
+        self.threshold = threshold
+        self.stats = df.select_dtypes('number').columns.to_list() if stats is None else list(stats)
+
+        self.keys = df[key].to_numpy()
+        self.values = {stat: df[stat].to_numpy() for stat in self.stats}
+
+        # Rows with unknown threshold are never above a cutoff
+        values = df[threshold].to_numpy()
+        known = np.flatnonzero(pd.notnull(values))
+
+        self.by_threshold = known[np.argsort(values[known], kind='stable')]
+        self.thresholds = values[self.by_threshold]
+
+        self.orders = dict()
+        self.ranks = dict()
+
+        for stat in self.stats:
+            order = np.argsort(-self.values[stat].astype(np.float64), kind='stable')
+
+            ranks = np.empty(len(order), dtype=np.int64)
+            ranks[order] = np.arange(len(order))
+
+            self.orders[stat] = order
+            self.ranks[stat] = ranks
+
+    def __len__(self):
+
+        return len(self.keys)
+
+    def above(self, min_value):
+        """
+
+        Positions of rows with threshold column above `min_value`.
+
+        """
+
+        return self.by_threshold[np.searchsorted(self.thresholds, min_value, side='right'):]
+
+    def top(self, stat, n=10, min_value=None):
+        """
+
+        Get `n` countries with the highest `stat`, of those with
+        threshold column above `min_value` if given.
+
+        Returns rows of (key, stat) in descending order.
+
+        """
+
+        if stat not in self.ranks:
+            raise KeyError(stat)
+
+        order = self.orders[stat]
+        rows = None if min_value is None else self.above(min_value)
+
+        if rows is None or len(rows) == len(order):
+            top = order[:n]
+        else:
+            ranks = self.ranks[stat][rows]
+
+            if n < len(ranks):
+                ranks = ranks[np.argpartition(ranks, n)[:n]]
+
+            top = order[np.sort(ranks)]
+
+        return pd.DataFrame({self.key: self.keys[top], stat: self.values[stat][top]})